@@ -1,26 +1,25 @@
 from fastapi import APIRouter, Depends, HTTPException, status
 from fastapi.security import OAuth2PasswordBearer
-from sqlalchemy.orm import Session
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
 from datetime import datetime, timedelta
 from jose import JWTError, jwt
+import asyncio
+import logging
 import secrets
 from uuid import uuid4
-from .database import get_db
-from .models import User, ConfirmationCode, LoginSession
+from .database import get_async_db
+from .notifications import login_notifier, wait_notified
+from .ephemeral import ephemeral_store, LoginState
+from .search import user_search_index
+from .passwords import hash_password_async, verify_password_async
+from .models import User
 from .schemas import (RegisterRequest, ConfirmRequest,
     CheckTelegramRequest, VerifyLoginRequest, LoginRequest)
 from pydantic import BaseModel
 import os
-from dotenv import load_dotenv
-import hashlib
-from bot import send_login_2fa_buttons
-load_dotenv()
 
-def hash_password(password: str) -> str:
-    return hashlib.sha512(password.encode()).hexdigest()
-
-def verify_password(plain_password: str, hashed_password: str) -> bool:
-    return hash_password(plain_password) == hashed_password
+logger = logging.getLogger(__name__)
 
 router = APIRouter(prefix="/api/auth")
 oauth2_scheme = OAuth2PasswordBearer(tokenUrl="token")
@@ -28,32 +27,56 @@ oauth2_scheme = OAuth2PasswordBearer(tokenUrl="token")
 SECRET_KEY = os.getenv("JWT_SECRET_KEY", "mega-secret-key")
 ALGORITHM = os.getenv("JWT_ALGORITHM", "HS256")
 ACCESS_TOKEN_EXPIRE_MINUTES = os.getenv("JWT_ACCESS_TOKEN_EXPIRE_MINUTES", "360")
+LOGIN_WAIT_TIMEOUT_SECONDS = float(os.getenv("LOGIN_WAIT_TIMEOUT_SECONDS", "25"))
+LOGIN_WAIT_RECHECK_SECONDS = float(os.getenv("LOGIN_WAIT_RECHECK_SECONDS", "5"))
+CONFIRMATION_CODE_ATTEMPTS = 3
+
+def send_login_2fa_buttons(telegram_id: str, session_token: str):
+    # bot.py builds the TeleBot client, so it is loaded on the first login
+    # prompt rather than when the API is imported
+    from bot import send_login_2fa_buttons as send
+    send(telegram_id, session_token)
+
+def create_access_token(user: User) -> str:
+    # The user id travels in the token so authenticated requests
+    # can resolve the principal without a users-table lookup.
+    token_data = {"sub": user.email, "uid": user.id}
+    expires = timedelta(minutes=int(ACCESS_TOKEN_EXPIRE_MINUTES))
+    return jwt.encode(
+        {"exp": datetime.now() + expires, **token_data},
+        SECRET_KEY,
+        ALGORITHM
+    )
 
 @router.post("/register")
-async def register(request: RegisterRequest, db: Session = Depends(get_db)):
-    if db.query(User).filter(
+async def register(request: RegisterRequest, db: AsyncSession = Depends(get_async_db)):
+    if await db.scalar(select(User).where(
         (User.email == request.email) |
         (User.phone == request.phone)
-    ).first():
+    )):
         raise HTTPException(status_code=400, detail="User already exists")
 
     user = User(
         email=request.email,
         phone=request.phone,
         name=request.name,
-        password_hash= hash_password(request.password)
+        password_hash=await hash_password_async(request.password)
     )
-    code = str(secrets.randbelow(999999)).zfill(6)
-    db.query(ConfirmationCode).filter(
-        ConfirmationCode.email == request.email
-    ).delete()
-    db_code = ConfirmationCode(
-        email=request.email,
-        code=code
-    )
-    db.add(db_code)
+    # Stored before the user so a failed insert only leaves a code to expire.
+    # 128 random bits make a clash practically impossible, but the store
+    # still refuses a code another email holds, so draw again if it does.
+    for _ in range(CONFIRMATION_CODE_ATTEMPTS):
+        code = secrets.token_hex(16)
+        if await ephemeral_store.call(ephemeral_store.put_confirmation_code, request.email, code):
+            break
+    else:
+        raise HTTPException(
+            status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+            detail="Could not allocate a confirmation code"
+        )
     db.add(user)
-    db.commit()
+    await db.commit()
+    user_search_index.invalidate()
 
     return {
         "status": "success",
@@ -64,9 +87,9 @@ async def register(request: RegisterRequest, db: Session = Depends(get_db)):
 @router.post("/check-telegram")
 async def check_telegram_auth(
     request: CheckTelegramRequest,
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_async_db)
 ):
-    user = db.query(User).filter(User.email == request.email).first()
+    user = await db.scalar(select(User).where(User.email == request.email))
 
     if not user:
         raise HTTPException(
@@ -80,23 +103,24 @@ async def check_telegram_auth(
             detail="Telegram not linked"
         )
 
-    token_data = {"sub": user.email}
-    expires = timedelta(minutes=int(ACCESS_TOKEN_EXPIRE_MINUTES))
-    access_token = jwt.encode(
-        {"exp": datetime.now() + expires, **token_data},
-        SECRET_KEY,
-        ALGORITHM
-    )
+    access_token = create_access_token(user)
 
     return {"status": "success", "token": access_token}
 
 @router.post("/login")
 async def login(
     request: LoginRequest,
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_async_db)
 ):
-    user = db.query(User).filter(User.email == request.email).first()
-    if not user or not verify_password(request.password, user.password_hash):
+    user = await db.scalar(select(User).where(User.email == request.email))
+    if not user:
+        raise HTTPException(
+            status_code=status.HTTP_401_UNAUTHORIZED,
+            detail="Invalid credentials"
+        )
+
+    is_valid, new_hash = await verify_password_async(request.password, user.password_hash)
+    if not is_valid:
         raise HTTPException(
             status_code=status.HTTP_401_UNAUTHORIZED,
             detail="Invalid credentials"
@@ -108,13 +132,15 @@ async def login(
             detail="Telegram not linked"
         )
 
+    if new_hash:
+        # Legacy SHA-512 or outdated cost: upgrade the stored hash
+        user.password_hash = new_hash
+        await db.commit()
+
     session_token = str(uuid4())
-    login_session = LoginSession(
-        user_id=user.id,
-        session_token=session_token
+    await ephemeral_store.call(
+        ephemeral_store.create_login_session, session_token, user.id
     )
-    db.add(login_session)
-    db.commit()
 
     try:
         send_login_2fa_buttons(user.telegram_id, session_token)
@@ -131,21 +157,39 @@ async def login(
         "message": "Please confirm login in Telegram"
     }
 
+def session_not_found():
+    return HTTPException(
+        status_code=status.HTTP_404_NOT_FOUND,
+        detail="Session not found or expired"
+    )
+
+async def get_login_session(session_token: str) -> LoginState:
+    login_session = await ephemeral_store.call(
+        ephemeral_store.get_login_session, session_token
+    )
+    if not login_session:
+        raise session_not_found()
+    return login_session
+
+async def complete_login(db: AsyncSession, session_token: str):
+    # Popping makes the session single-use even under concurrent verifies
+    login_session = await ephemeral_store.call(
+        ephemeral_store.pop_login_session, session_token
+    )
+    if not login_session:
+        raise session_not_found()
+
+    user = await db.get(User, login_session.user_id)
+    access_token = create_access_token(user)
+
+    return {"status": "success", "token": access_token}
+
 @router.post("/verify-login")
 async def verify_login(
     request: VerifyLoginRequest,
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_async_db)
 ):
-    login_session = db.query(LoginSession).filter(
-        LoginSession.session_token == request.session_token,
-        LoginSession.expires_at > datetime.now()
-    ).first()
-
-    if not login_session:
-        raise HTTPException(
-            status_code=status.HTTP_404_NOT_FOUND,
-            detail="Session not found or expired"
-        )
+    login_session = await get_login_session(request.session_token)
 
     if not login_session.is_confirmed:
         raise HTTPException(
@@ -153,16 +197,33 @@ async def verify_login(
             detail="Login not confirmed"
         )
 
-    user = login_session.user
-    token_data = {"sub": user.email}
-    expires = timedelta(minutes=int(ACCESS_TOKEN_EXPIRE_MINUTES))
-    access_token = jwt.encode(
-        {"exp": datetime.now() + expires, **token_data},
-        SECRET_KEY,
-        ALGORITHM
-    )
-
-    db.delete(login_session)
-    db.commit()
+    return await complete_login(db, request.session_token)
 
-    return {"status": "success", "token": access_token}
+@router.post("/verify-login/wait")
+async def wait_for_login(
+    request: VerifyLoginRequest,
+    db: AsyncSession = Depends(get_async_db)
+):
+    """Long-poll variant of verify-login: holds the request until the bot
+    confirms or rejects the session, or LOGIN_WAIT_TIMEOUT_SECONDS pass."""
+    loop = asyncio.get_running_loop()
+    deadline = loop.time() + LOGIN_WAIT_TIMEOUT_SECONDS
+
+    while True:
+        # Subscribed before the read, so a confirmation landing between the
+        # two still wakes this request
+        with login_notifier.subscribe(request.session_token) as notified:
+            login_session = await get_login_session(request.session_token)
+            if login_session.is_confirmed:
+                return await complete_login(db, request.session_token)
+
+            remaining = deadline - loop.time()
+            if remaining <= 0:
+                raise HTTPException(
+                    status_code=status.HTTP_403_FORBIDDEN,
+                    detail="Login not confirmed"
+                )
+
+            # The recheck covers notifications missed while a listener reconnects
+            # and setups without a cross-process broadcast (SQLite)
+            await wait_notified(notified, min(remaining, LOGIN_WAIT_RECHECK_SECONDS))
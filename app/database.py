@@ -1,10 +1,16 @@
-from sqlalchemy import create_engine
+from sqlalchemy import create_engine, event
+from sqlalchemy.engine import make_url
+from sqlalchemy.exc import TimeoutError as PoolTimeoutError
+from sqlalchemy.ext.asyncio import create_async_engine, async_sessionmaker, AsyncSession
 from sqlalchemy.ext.declarative import declarative_base
 from sqlalchemy.orm import sessionmaker
+from sqlalchemy.pool import QueuePool, AsyncAdaptedQueuePool
 import os
-from dotenv import load_dotenv
-
-load_dotenv()
+import threading
+import time
+from .metrics import (DB_POOL_CHECKOUT_SECONDS, DB_POOL_CHECKOUT_TIMEOUTS,
+    DB_POOL_CHECKED_OUT, DB_POOL_CAPACITY)
+from .instrumentation import instrument_engine
 
 DB_HOST = os.getenv("DB_HOST")
 DB_PORT = os.getenv("DB_PORT")
@@ -12,10 +18,164 @@ DB_NAME = os.getenv("DB_NAME")
 DB_USER = os.getenv("DB_USER")
 DB_PASS = os.getenv("DB_PASS")
 
-SQLALCHEMY_DATABASE_URL = f"postgresql://{DB_USER}:{DB_PASS}@{DB_HOST}:{DB_PORT}/{DB_NAME}"
+# Connection budget of one process, split between the sync pool (get_db,
+# the ephemeral store, exports, the bot) and the async pool (auth and
+# organization handlers, the sweeper, /ready). A process holds at most
+# DB_POOL_SIZE + DB_MAX_OVERFLOW connections (each pool keeps at least
+# one); size Postgres' max_connections for that times the process count.
+DB_POOL_SIZE = int(os.getenv("DB_POOL_SIZE", "10"))
+DB_MAX_OVERFLOW = int(os.getenv("DB_MAX_OVERFLOW", "10"))
+# Fraction of the budget given to the async pool
+DB_ASYNC_POOL_SHARE = float(os.getenv("DB_ASYNC_POOL_SHARE", "0.5"))
+DB_POOL_TIMEOUT = float(os.getenv("DB_POOL_TIMEOUT", "30"))
+DB_POOL_RECYCLE = int(os.getenv("DB_POOL_RECYCLE", "1800"))
+DB_POOL_PRE_PING = os.getenv("DB_POOL_PRE_PING", "true").lower() == "true"
+DB_STATEMENT_TIMEOUT_MS = int(os.getenv("DB_STATEMENT_TIMEOUT_MS", "0"))
+
+SQLALCHEMY_DATABASE_URL = os.getenv(
+    "DATABASE_URL",
+    f"postgresql+psycopg2://{DB_USER}:{DB_PASS}@{DB_HOST}:{DB_PORT}/{DB_NAME}"
+)
+
+_ASYNC_DRIVERS = {"postgresql": "postgresql+asyncpg", "sqlite": "sqlite+aiosqlite"}
+
+def _async_url(url: str) -> str:
+    parsed = make_url(url)
+    backend = parsed.get_backend_name()
+    return parsed.set(drivername=_ASYNC_DRIVERS.get(backend, parsed.drivername)) \
+        .render_as_string(hide_password=False)
+
+ASYNC_SQLALCHEMY_DATABASE_URL = os.getenv(
+    "ASYNC_DATABASE_URL",
+    _async_url(SQLALCHEMY_DATABASE_URL)
+)
+
+
+class _InstrumentedPoolMixin:
+    pool_label = "sync"
+
+    def connect(self):
+        started = time.perf_counter()
+        try:
+            return super().connect()
+        except PoolTimeoutError:
+            DB_POOL_CHECKOUT_TIMEOUTS.labels(pool=self.pool_label).inc()
+            raise
+        finally:
+            DB_POOL_CHECKOUT_SECONDS.labels(pool=self.pool_label).observe(
+                time.perf_counter() - started
+            )
+
+class InstrumentedQueuePool(_InstrumentedPoolMixin, QueuePool):
+    pool_label = "sync"
+
+class InstrumentedAsyncQueuePool(_InstrumentedPoolMixin, AsyncAdaptedQueuePool):
+    pool_label = "async"
+
+
+def _split_budget(total: int, minimum: int):
+    async_part = max(minimum, round(total * DB_ASYNC_POOL_SHARE))
+    return {"sync": max(minimum, total - async_part), "async": async_part}
+
+# pool_size 0 would mean "unlimited" to QueuePool, hence the minimum of 1
+POOL_SIZES = _split_budget(DB_POOL_SIZE, 1)
+POOL_MAX_OVERFLOWS = _split_budget(DB_MAX_OVERFLOW, 0)
+
+
+def _engine_options(url: str, poolclass) -> dict:
+    """Pool settings for the process's sync or async engine, each with its
+    share of the connection budget. SQLite keeps SQLAlchemy's defaults."""
+    if make_url(url).get_backend_name() != "postgresql":
+        return {}
 
-engine = create_engine(SQLALCHEMY_DATABASE_URL)
-SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
+    options = {
+        "poolclass": poolclass,
+        "pool_size": POOL_SIZES[poolclass.pool_label],
+        "max_overflow": POOL_MAX_OVERFLOWS[poolclass.pool_label],
+        "pool_timeout": DB_POOL_TIMEOUT,
+        "pool_recycle": DB_POOL_RECYCLE,
+        "pool_pre_ping": DB_POOL_PRE_PING,
+    }
+    if DB_STATEMENT_TIMEOUT_MS:
+        if poolclass is InstrumentedAsyncQueuePool:
+            options["connect_args"] = {
+                "server_settings": {"statement_timeout": str(DB_STATEMENT_TIMEOUT_MS)}
+            }
+        else:
+            options["connect_args"] = {
+                "options": f"-c statement_timeout={DB_STATEMENT_TIMEOUT_MS}"
+            }
+    return options
+
+def _register_pool_gauges(label: str, pool, options: dict):
+    if not isinstance(pool, QueuePool):
+        return
+    # Counted on checkout/checkin rather than with set_function, which
+    # multiprocess metrics cannot collect. The checkin event fires before
+    # the pool counts the connection as returned, so checkedout() would lag.
+    checked_out = DB_POOL_CHECKED_OUT.labels(pool=label)
+    event.listen(pool, "checkout", lambda *args: checked_out.inc())
+    event.listen(pool, "checkin", lambda *args: checked_out.dec())
+    if options:
+        DB_POOL_CAPACITY.labels(pool=label).set(options["pool_size"] + options["max_overflow"])
+
+
+# One engine per process, shared by the API and bot.py. Both are built on
+# first use, so importing this module (or anything that imports it) opens
+# no pool and loads no async driver.
+_engine = None
+_async_engine = None
+_engine_lock = threading.Lock()
+
+def get_engine():
+    global _engine
+    if _engine is None:
+        with _engine_lock:
+            if _engine is None:
+                options = _engine_options(SQLALCHEMY_DATABASE_URL, InstrumentedQueuePool)
+                engine = create_engine(SQLALCHEMY_DATABASE_URL, **options)
+                _register_pool_gauges("sync", engine.pool, options)
+                instrument_engine(engine)
+                _engine = engine
+    return _engine
+
+def get_async_engine():
+    global _async_engine
+    if _async_engine is None:
+        with _engine_lock:
+            if _async_engine is None:
+                options = _engine_options(SQLALCHEMY_DATABASE_URL, InstrumentedAsyncQueuePool)
+                engine = create_async_engine(ASYNC_SQLALCHEMY_DATABASE_URL, **options)
+                _register_pool_gauges("async", engine.pool, options)
+                instrument_engine(engine.sync_engine)
+                _async_engine = engine
+    return _async_engine
+
+async def dispose_engines():
+    """Close whichever pools this process opened."""
+    if _async_engine is not None:
+        await _async_engine.dispose()
+    if _engine is not None:
+        _engine.dispose()
+
+
+class _LazySessionmaker(sessionmaker):
+    def __call__(self, **local_kw):
+        local_kw.setdefault("bind", get_engine())
+        return super().__call__(**local_kw)
+
+class _LazyAsyncSessionmaker(async_sessionmaker):
+    def __call__(self, **local_kw):
+        local_kw.setdefault("bind", get_async_engine())
+        return super().__call__(**local_kw)
+
+
+SessionLocal = _LazySessionmaker(autocommit=False, autoflush=False)
+AsyncSessionLocal = _LazyAsyncSessionmaker(
+    class_=AsyncSession,
+    autoflush=False,
+    expire_on_commit=False
+)
 
 Base = declarative_base()
 
@@ -25,3 +185,19 @@ def get_db():
         yield db
     finally:
         db.close()
+
+async def get_async_db():
+    async with AsyncSessionLocal() as db:
+        yield db
+
+def schema_revisions():
+    """(current, head) Alembic revisions of the database and of
+    migrations/versions. Alembic is only imported when this runs."""
+    from alembic.runtime.migration import MigrationContext
+    from alembic.script import ScriptDirectory
+
+    root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+    heads = set(ScriptDirectory(os.path.join(root, "migrations")).get_heads())
+    with get_engine().connect() as conn:
+        current = set(MigrationContext.configure(conn).get_current_heads())
+    return current, heads
@@ -0,0 +1,131 @@
+import logging
+import queue
+import threading
+import time
+from dataclasses import dataclass, field
+from typing import Any, Callable, List, Optional
+
+from .metrics import (UPDATES_IN_FLIGHT, UPDATE_WAIT_SECONDS,
+    UPDATE_LAG_SECONDS, UPDATE_HANDLE_SECONDS, UPDATES)
+
+logger = logging.getLogger(__name__)
+
+
+class DispatcherFull(Exception):
+    pass
+
+
+@dataclass
+class QueuedUpdate:
+    update: Any
+    received_at: float = field(default_factory=time.monotonic)
+
+
+def update_kind(update) -> str:
+    if update.message is not None:
+        return "message"
+    if update.callback_query is not None:
+        return "callback_query"
+    return "other"
+
+
+def update_chat(update) -> Optional[int]:
+    """The chat whose updates must stay in order. Login callbacks come from
+    the user's private chat, whose id is the user's id."""
+    if update.message is not None:
+        return update.message.chat.id
+    if update.callback_query is not None:
+        return update.callback_query.from_user.id
+    return None
+
+
+class TelegramUpdateDispatcher:
+    """Handles bot updates on a fixed set of worker threads.
+
+    Every update of a chat goes to the same worker, so a chat's updates are
+    handled in the order Telegram sent them while other chats proceed in
+    parallel. Each worker's queue is bounded: submit blocks, or raises
+    DispatcherFull after `timeout`, when that worker is backed up.
+    """
+
+    def __init__(
+        self,
+        handle: Callable[[Any], None],
+        workers: int = 8,
+        max_queue: int = 100
+    ):
+        self._handle = handle
+        self._queues: List["queue.Queue[Optional[QueuedUpdate]]"] = [
+            queue.Queue(maxsize=max_queue) for _ in range(workers)
+        ]
+        self._threads = []
+        self._start_lock = threading.Lock()
+
+    def start(self):
+        with self._start_lock:
+            if self._threads:
+                return
+            for i, updates in enumerate(self._queues):
+                thread = threading.Thread(
+                    target=self._run,
+                    args=(updates,),
+                    name=f"telegram-updates-{i}",
+                    daemon=True
+                )
+                thread.start()
+                self._threads.append(thread)
+
+    def stop(self, timeout: Optional[float] = None):
+        """Let the workers finish what is already queued, then exit."""
+        with self._start_lock:
+            threads, self._threads = self._threads, []
+        if not threads:
+            return
+        for updates in self._queues:
+            updates.put(None)
+        for thread in threads:
+            thread.join(timeout)
+
+    def submit(self, update, timeout: Optional[float] = None):
+        self.start()
+        chat = update_chat(update)
+        shard = hash(chat if chat is not None else update.update_id) % len(self._queues)
+        # Counted before the put so a fast worker never decrements first
+        UPDATES_IN_FLIGHT.inc()
+        try:
+            self._queues[shard].put(QueuedUpdate(update), timeout=timeout)
+        except queue.Full:
+            UPDATES_IN_FLIGHT.dec()
+            UPDATES.labels(kind=update_kind(update), result="rejected").inc()
+            raise DispatcherFull("Telegram update queue is full")
+
+    def qsize(self) -> int:
+        return sum(updates.qsize() for updates in self._queues)
+
+    def _run(self, updates: "queue.Queue[Optional[QueuedUpdate]]"):
+        while True:
+            queued = updates.get()
+            if queued is None:
+                return
+            try:
+                self._process(queued)
+            finally:
+                UPDATES_IN_FLIGHT.dec()
+
+    def _process(self, queued: QueuedUpdate):
+        update = queued.update
+        kind = update_kind(update)
+        started = time.monotonic()
+        UPDATE_WAIT_SECONDS.observe(started - queued.received_at)
+        try:
+            self._handle(update)
+        except Exception as e:
+            UPDATES.labels(kind=kind, result="failed").inc()
+            logger.error(f"Error handling update {update.update_id}: {e}")
+        else:
+            UPDATES.labels(kind=kind, result="handled").inc()
+        UPDATE_HANDLE_SECONDS.labels(kind=kind).observe(time.monotonic() - started)
+        # Only messages carry Telegram's timestamp; callback queries do not
+        if update.message is not None:
+            UPDATE_LAG_SECONDS.labels(kind=kind).observe(max(0.0, time.time() - update.message.date))
+
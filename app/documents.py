@@ -0,0 +1,157 @@
+import base64
+from datetime import datetime
+from typing import Iterable, List, Optional, Sequence, Tuple
+
+from sqlalchemy import case, func, insert, literal, select, tuple_, union, update
+from sqlalchemy.orm import Session
+
+from .enums import DocumentStatus, SignatureStatus
+from .models import Document, Signature, User
+
+
+def recipients_exist(db: Session, recipient_ids: Iterable[int]) -> bool:
+    """True when every id refers to an existing user, checked with one COUNT."""
+    unique_ids = set(recipient_ids)
+    if not unique_ids:
+        return True
+    found = db.scalar(
+        select(func.count()).select_from(User).where(User.id.in_(unique_ids))
+    )
+    return found == len(unique_ids)
+
+
+def create_documents(db: Session, sender_id: int, drafts: Sequence) -> List[int]:
+    """Insert documents and one pending signature per recipient.
+
+    Both inserts are executemany statements, which SQLAlchemy sends as
+    batched multi-row INSERTs, and nothing is committed here so the caller
+    gets all of it in a single transaction. `drafts` are DocumentDraft-like
+    objects with title, file_url, recipients and optionally organization_id.
+    """
+    recipients = [list(dict.fromkeys(draft.recipients)) for draft in drafts]
+
+    document_ids = db.scalars(
+        insert(Document).returning(Document.id, sort_by_parameter_order=True),
+        [{
+            "title": draft.title,
+            "content": draft.file_url,
+            "sender_id": sender_id,
+            "organization_id": getattr(draft, "organization_id", None),
+            "status": DocumentStatus.DRAFT,
+            "pending_signatures": len(signers)
+        } for draft, signers in zip(drafts, recipients)]
+    ).all()
+
+    signatures = [{
+        "document_id": document_id,
+        "signer_id": signer_id,
+        "status": SignatureStatus.PENDING
+    } for document_id, signers in zip(document_ids, recipients)
+        for signer_id in signers]
+
+    if signatures:
+        db.execute(insert(Signature), signatures)
+
+    return list(document_ids)
+
+
+def sign_document(db: Session, document_id: int, signer_id: int) -> Optional[int]:
+    """Sign the signer's pending signature and return how many are left,
+    or None if there was nothing to sign. The caller commits.
+
+    Two conditional UPDATEs, both O(1): the signature row lock makes a
+    repeated sign by the same user a no-op, and the counter decrement is a
+    single atomic UPDATE, so whichever signer takes it to zero is the one
+    that flips the document to SIGNED, however many sign concurrently.
+    """
+    signed = db.execute(
+        update(Signature).where(
+            Signature.document_id == document_id,
+            Signature.signer_id == signer_id,
+            Signature.status == SignatureStatus.PENDING
+        ).values(
+            status=SignatureStatus.SIGNED,
+            signed_at=datetime.utcnow()
+        ).returning(Signature.id)
+    ).first()
+
+    if signed is None:
+        return None
+
+    return db.execute(
+        update(Document).where(
+            Document.id == document_id
+        ).values(
+            pending_signatures=Document.pending_signatures - 1,
+            status=case(
+                (Document.pending_signatures == 1,
+                 literal(DocumentStatus.SIGNED, Document.status.type)),
+                else_=Document.status
+            )
+        ).returning(Document.pending_signatures)
+    ).scalar_one()
+
+
+def pack_cursor(raw: str) -> str:
+    """Opaque, URL-safe form of a cursor's fields."""
+    return base64.urlsafe_b64encode(raw.encode()).decode().rstrip("=")
+
+
+def unpack_cursor(cursor: str) -> str:
+    """Inverse of pack_cursor; raises ValueError for malformed input."""
+    padded = cursor + "=" * (-len(cursor) % 4)
+    return base64.urlsafe_b64decode(padded).decode()
+
+
+def encode_cursor(created_at: datetime, document_id: int) -> str:
+    return pack_cursor(f"{created_at.isoformat()}|{document_id}")
+
+
+def decode_cursor(cursor: str) -> Tuple[datetime, int]:
+    """Raises ValueError for anything that is not a cursor we issued."""
+    try:
+        created_at, document_id = unpack_cursor(cursor).split("|")
+        return datetime.fromisoformat(created_at), int(document_id)
+    except ValueError as e:
+        raise ValueError("Invalid cursor") from e
+
+
+def inbox_query(
+    user_id: int,
+    direction: str = "all",
+    status: Optional[DocumentStatus] = None,
+    cursor: Optional[str] = None,
+    limit: int = 50
+):
+    """Documents the user sent and/or has to sign, newest first.
+
+    The "all" branch is an IN over a UNION of the two id sets rather than
+    `sent OR EXISTS(...)`: an OR across them cannot use either index and
+    degrades into a scan of the whole documents table. The UNION also
+    de-duplicates documents the user both sent and signs. (created_at, id)
+    is a stable keyset for cursor pagination.
+    """
+    sent_ids = select(Document.id).where(Document.sender_id == user_id)
+    received_ids = select(Signature.document_id).where(Signature.signer_id == user_id)
+    condition = {
+        "sent": Document.sender_id == user_id,
+        "received": Document.id.in_(received_ids),
+        "all": Document.id.in_(union(sent_ids, received_ids))
+    }[direction]
+
+    query = select(
+        Document.id, Document.title, Document.status, Document.created_at
+    ).where(condition)
+
+    if status is not None:
+        query = query.where(Document.status == status)
+
+    if cursor:
+        created_at, document_id = decode_cursor(cursor)
+        query = query.where(
+            tuple_(Document.created_at, Document.id) < tuple_(created_at, document_id)
+        )
+
+    return query.order_by(
+        Document.created_at.desc(), Document.id.desc()
+    ).limit(limit)
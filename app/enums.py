@@ -12,6 +12,10 @@ class DocumentStatus(str, Enum):
     SIGNED = "signed"
     DECLINED = "declined"
 
+class SignatureStatus(str, Enum):
+    PENDING = "pending"
+    SIGNED = "signed"
+
 class InviteStatus(str, Enum):
     PENDING = "pending"
     ACCEPTED = "accepted"
@@ -0,0 +1,315 @@
+import os
+import threading
+import time
+from dataclasses import dataclass
+from datetime import datetime, timedelta
+from typing import Dict, Optional, Tuple
+
+from sqlalchemy import select, update, delete
+from sqlalchemy.exc import IntegrityError
+from starlette.concurrency import run_in_threadpool
+
+from .database import SessionLocal
+from .models import LoginSession, ConfirmationCode
+
+EPHEMERAL_BACKEND = os.getenv("EPHEMERAL_BACKEND", "database")
+EPHEMERAL_REDIS_URL = os.getenv("EPHEMERAL_REDIS_URL", "redis://localhost:6379/0")
+EPHEMERAL_REDIS_PREFIX = os.getenv("EPHEMERAL_REDIS_PREFIX", "flagship:")
+LOGIN_SESSION_TTL_SECONDS = int(os.getenv("LOGIN_SESSION_TTL_SECONDS", "600"))
+CONFIRMATION_CODE_TTL_SECONDS = int(os.getenv("CONFIRMATION_CODE_TTL_SECONDS", "900"))
+
+
+@dataclass(frozen=True)
+class LoginState:
+    user_id: int
+    is_confirmed: bool
+
+
+class EphemeralStore:
+    """Short-lived auth state: pending 2FA login sessions and Telegram
+    registration codes. Entries vanish once their TTL passes.
+
+    Methods are synchronous so the bot threads can call them directly;
+    async handlers go through `call`, which only hops to the threadpool
+    for backends that block on I/O.
+    """
+
+    blocking = True
+
+    def create_login_session(self, session_token: str, user_id: int,
+                             ttl: int = LOGIN_SESSION_TTL_SECONDS):
+        raise NotImplementedError
+
+    def get_login_session(self, session_token: str) -> Optional[LoginState]:
+        raise NotImplementedError
+
+    def confirm_login_session(self, session_token: str) -> bool:
+        """Mark a live session confirmed. False if it is gone."""
+        raise NotImplementedError
+
+    def pop_login_session(self, session_token: str) -> Optional[LoginState]:
+        """Atomically remove a live session and return its last state."""
+        raise NotImplementedError
+
+    def put_confirmation_code(self, email: str, code: str,
+                              ttl: int = CONFIRMATION_CODE_TTL_SECONDS) -> bool:
+        """Store a code for `email`, replacing any earlier one. False, and
+        nothing stored, if another email already holds `code`."""
+        raise NotImplementedError
+
+    def pop_confirmation_email(self, code: str) -> Optional[str]:
+        """Atomically consume a live code and return its email, so two
+        concurrent /start reg_ messages cannot both redeem it."""
+        raise NotImplementedError
+
+    async def call(self, method, *args):
+        if self.blocking:
+            return await run_in_threadpool(method, *args)
+        return method(*args)
+
+
+class DatabaseEphemeralStore(EphemeralStore):
+    """Keeps the state in the login_sessions / confirmation_codes tables;
+    expired rows are filtered on read and removed by the sweeper."""
+
+    def __init__(self, session_factory=SessionLocal):
+        self.session_factory = session_factory
+
+    def create_login_session(self, session_token, user_id, ttl=LOGIN_SESSION_TTL_SECONDS):
+        with self.session_factory() as db:
+            db.add(LoginSession(
+                user_id=user_id,
+                session_token=session_token,
+                expires_at=datetime.now() + timedelta(seconds=ttl)
+            ))
+            db.commit()
+
+    def get_login_session(self, session_token):
+        with self.session_factory() as db:
+            row = db.execute(select(LoginSession.user_id, LoginSession.is_confirmed).where(
+                LoginSession.session_token == session_token,
+                LoginSession.expires_at > datetime.now()
+            )).first()
+        return LoginState(row.user_id, bool(row.is_confirmed)) if row else None
+
+    def confirm_login_session(self, session_token):
+        with self.session_factory() as db:
+            result = db.execute(update(LoginSession).where(
+                LoginSession.session_token == session_token,
+                LoginSession.expires_at > datetime.now()
+            ).values(is_confirmed=True))
+            db.commit()
+        return result.rowcount > 0
+
+    def pop_login_session(self, session_token):
+        with self.session_factory() as db:
+            row = db.execute(delete(LoginSession).where(
+                LoginSession.session_token == session_token,
+                LoginSession.expires_at > datetime.now()
+            ).returning(LoginSession.user_id, LoginSession.is_confirmed)).first()
+            db.commit()
+        return LoginState(row.user_id, bool(row.is_confirmed)) if row else None
+
+    def put_confirmation_code(self, email, code, ttl=CONFIRMATION_CODE_TTL_SECONDS):
+        with self.session_factory() as db:
+            db.execute(delete(ConfirmationCode).where(ConfirmationCode.email == email))
+            db.add(ConfirmationCode(
+                email=email,
+                code=code,
+                expires_at=datetime.now() + timedelta(seconds=ttl)
+            ))
+            try:
+                db.commit()
+            except IntegrityError:
+                # ix_confirmation_codes_code is unique
+                db.rollback()
+                return False
+        return True
+
+    def pop_confirmation_email(self, code):
+        with self.session_factory() as db:
+            email = db.scalar(delete(ConfirmationCode).where(
+                ConfirmationCode.code == code,
+                ConfirmationCode.expires_at > datetime.now()
+            ).returning(ConfirmationCode.email))
+            db.commit()
+        return email
+
+
+class MemoryEphemeralStore(EphemeralStore):
+    """Process-local store. Only valid when one process both creates and
+    confirms login sessions: BOT_MODE=webhook with a single API worker.
+    run.py refuses it in any other layout."""
+
+    blocking = False
+
+    # Expired entries are dropped on access and by a full scan every
+    # PURGE_EVERY writes, so abandoned ones cannot pile up.
+    PURGE_EVERY = 1000
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._sessions: Dict[str, Tuple[float, LoginState]] = {}
+        self._codes: Dict[str, Tuple[float, str]] = {}
+        self._code_by_email: Dict[str, str] = {}
+        self._writes = 0
+
+    @staticmethod
+    def _live(table: dict, key: str):
+        entry = table.get(key)
+        if entry is None:
+            return None
+        if entry[0] <= time.monotonic():
+            del table[key]
+            return None
+        return entry
+
+    def _written(self):
+        self._writes += 1
+        if self._writes % self.PURGE_EVERY:
+            return
+        now = time.monotonic()
+        for table in (self._sessions, self._codes):
+            for key in [k for k, (expires, _) in table.items() if expires <= now]:
+                del table[key]
+        self._code_by_email = {
+            email: code for email, code in self._code_by_email.items() if code in self._codes
+        }
+
+    def create_login_session(self, session_token, user_id, ttl=LOGIN_SESSION_TTL_SECONDS):
+        with self._lock:
+            self._sessions[session_token] = (time.monotonic() + ttl, LoginState(user_id, False))
+            self._written()
+
+    def get_login_session(self, session_token):
+        with self._lock:
+            entry = self._live(self._sessions, session_token)
+        return entry[1] if entry else None
+
+    def confirm_login_session(self, session_token):
+        with self._lock:
+            entry = self._live(self._sessions, session_token)
+            if not entry:
+                return False
+            expires, state = entry
+            self._sessions[session_token] = (expires, LoginState(state.user_id, True))
+        return True
+
+    def pop_login_session(self, session_token):
+        with self._lock:
+            entry = self._live(self._sessions, session_token)
+            if entry:
+                del self._sessions[session_token]
+        return entry[1] if entry else None
+
+    def put_confirmation_code(self, email, code, ttl=CONFIRMATION_CODE_TTL_SECONDS):
+        with self._lock:
+            taken = self._live(self._codes, code)
+            if taken and taken[1] != email:
+                return False
+            previous = self._code_by_email.pop(email, None)
+            if previous is not None:
+                self._codes.pop(previous, None)
+            self._codes[code] = (time.monotonic() + ttl, email)
+            self._code_by_email[email] = code
+            self._written()
+        return True
+
+    def pop_confirmation_email(self, code):
+        with self._lock:
+            entry = self._live(self._codes, code)
+            if not entry:
+                return None
+            del self._codes[code]
+            if self._code_by_email.get(entry[1]) == code:
+                del self._code_by_email[entry[1]]
+        return entry[1]
+
+
+class RedisEphemeralStore(EphemeralStore):
+    """Redis-backed store; TTLs are native key expiries. Any client with
+    the redis-py interface works, e.g. fakeredis for local runs."""
+
+    def __init__(self, client, prefix: str = EPHEMERAL_REDIS_PREFIX):
+        self.client = client
+        self.prefix = prefix
+
+    def _session_key(self, session_token):
+        return f"{self.prefix}login:{session_token}"
+
+    def _code_key(self, code):
+        return f"{self.prefix}code:{code}"
+
+    def _email_key(self, email):
+        return f"{self.prefix}code-email:{email}"
+
+    @staticmethod
+    def _state(data) -> Optional[LoginState]:
+        if not data:
+            return None
+        return LoginState(int(data[b"user_id"]), data.get(b"confirmed") == b"1")
+
+    def create_login_session(self, session_token, user_id, ttl=LOGIN_SESSION_TTL_SECONDS):
+        key = self._session_key(session_token)
+        pipe = self.client.pipeline()
+        pipe.hset(key, mapping={"user_id": user_id, "confirmed": 0})
+        pipe.expire(key, ttl)
+        pipe.execute()
+
+    def get_login_session(self, session_token):
+        return self._state(self.client.hgetall(self._session_key(session_token)))
+
+    def confirm_login_session(self, session_token):
+        key = self._session_key(session_token)
+
+        # HSET on a missing key would recreate it without a TTL, so the
+        # existence check and the write run under WATCH.
+        def confirm(pipe):
+            if not pipe.exists(key):
+                return False
+            pipe.multi()
+            pipe.hset(key, "confirmed", 1)
+            return True
+
+        return self.client.transaction(confirm, key, value_from_callable=True)
+
+    def pop_login_session(self, session_token):
+        key = self._session_key(session_token)
+        pipe = self.client.pipeline()
+        pipe.hgetall(key)
+        pipe.delete(key)
+        data, _ = pipe.execute()
+        return self._state(data)
+
+    def put_confirmation_code(self, email, code, ttl=CONFIRMATION_CODE_TTL_SECONDS):
+        # NX claims the code; only then is the email repointed at it
+        if not self.client.set(self._code_key(code), email, ex=ttl, nx=True):
+            return False
+        previous = self.client.set(self._email_key(email), code, ex=ttl, get=True)
+        if previous is not None and previous.decode() != code:
+            self.client.delete(self._code_key(previous.decode()))
+        return True
+
+    def pop_confirmation_email(self, code):
+        email = self.client.getdel(self._code_key(code))
+        if email is None:
+            return None
+        # Leave the email's pointer alone if a newer code replaced it
+        email_key = self._email_key(email.decode())
+        if self.client.get(email_key) == code.encode():
+            self.client.delete(email_key)
+        return email.decode()
+
+
+def create_store(backend: str = EPHEMERAL_BACKEND) -> EphemeralStore:
+    if backend == "database":
+        return DatabaseEphemeralStore()
+    if backend == "memory":
+        return MemoryEphemeralStore()
+    if backend == "redis":
+        import redis
+        return RedisEphemeralStore(redis.Redis.from_url(EPHEMERAL_REDIS_URL))
+    raise ValueError(f"Unknown EPHEMERAL_BACKEND: {backend}")
+
+
+ephemeral_store = create_store()
@@ -0,0 +1,116 @@
+import csv
+import io
+import json
+import os
+from datetime import datetime
+from enum import Enum
+from typing import Iterator, Literal
+
+from fastapi.responses import StreamingResponse
+from sqlalchemy import select, union
+
+from .database import SessionLocal
+from .models import (User, UserOrganization, UserDepartmentRole,
+    Document, Signature)
+
+# Rows fetched per server-side cursor round trip, and per response chunk
+EXPORT_BATCH_SIZE = int(os.getenv("EXPORT_BATCH_SIZE", "1000"))
+
+ExportFormat = Literal["ndjson", "csv"]
+
+MEDIA_TYPES = {
+    "ndjson": "application/x-ndjson",
+    "csv": "text/csv; charset=utf-8",
+}
+
+
+def organization_users_query(org_id: int):
+    return select(User.id.label("user_id"), User.name, User.email).join(
+        UserOrganization, UserOrganization.user_id == User.id
+    ).where(
+        UserOrganization.organization_id == org_id
+    ).order_by(User.id)
+
+
+def department_users_query(dep_id: int):
+    return select(
+        User.id.label("user_id"), User.name, User.email, UserDepartmentRole.role
+    ).join(
+        UserDepartmentRole, UserDepartmentRole.user_id == User.id
+    ).where(
+        UserDepartmentRole.department_id == dep_id
+    ).order_by(User.id)
+
+
+def ledger_query(user_id: int = None, org_id: int = None):
+    """One row per document and signature: documents of an organization,
+    or those a user sent or has to sign. Documents without recipients
+    appear once, with empty signature columns."""
+    query = select(
+        Document.id.label("document_id"),
+        Document.title,
+        Document.sender_id,
+        Document.status,
+        Document.created_at,
+        Signature.signer_id,
+        Signature.status.label("signature_status"),
+        Signature.signed_at
+    ).outerjoin(
+        Signature, Signature.document_id == Document.id
+    )
+
+    if org_id is not None:
+        query = query.where(Document.organization_id == org_id)
+    else:
+        query = query.where(Document.id.in_(union(
+            select(Document.id).where(Document.sender_id == user_id),
+            select(Signature.document_id).where(Signature.signer_id == user_id)
+        )))
+    return query.order_by(Document.id, Signature.id)
+
+
+def _value(value):
+    if isinstance(value, Enum):
+        return value.value
+    if isinstance(value, datetime):
+        return value.isoformat()
+    return value
+
+
+def _ndjson_chunk(columns, rows) -> bytes:
+    return "".join(
+        json.dumps(dict(zip(columns, map(_value, row))), ensure_ascii=False) + "\n"
+        for row in rows
+    ).encode()
+
+
+def _csv_chunk(rows) -> bytes:
+    buffer = io.StringIO()
+    csv.writer(buffer).writerows(
+        ["" if v is None else _value(v) for v in row] for row in rows
+    )
+    return buffer.getvalue().encode()
+
+
+def stream_rows(query, fmt: ExportFormat) -> Iterator[bytes]:
+    """Encode the query's rows chunk by chunk.
+
+    The generator owns its session: it runs after the request's
+    dependencies are torn down. yield_per turns on a server-side cursor,
+    so only EXPORT_BATCH_SIZE rows are held at any time.
+    """
+    with SessionLocal() as db:
+        result = db.execute(query.execution_options(yield_per=EXPORT_BATCH_SIZE))
+        columns = list(result.keys())
+        if fmt == "csv":
+            yield _csv_chunk([columns])
+        for rows in result.partitions():
+            yield _csv_chunk(rows) if fmt == "csv" else _ndjson_chunk(columns, rows)
+
+
+def export_response(query, fmt: ExportFormat, filename: str) -> StreamingResponse:
+    return StreamingResponse(
+        stream_rows(query, fmt),
+        media_type=MEDIA_TYPES[fmt],
+        headers={"Content-Disposition": f'attachment; filename="{filename}.{fmt}"'}
+    )
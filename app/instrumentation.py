@@ -0,0 +1,104 @@
+import logging
+import os
+import time
+from contextvars import ContextVar
+from typing import List, Optional
+
+from sqlalchemy import event
+
+from .metrics import (HTTP_REQUEST_SECONDS, HTTP_REQUESTS_IN_FLIGHT,
+    HTTP_REQUEST_SQL_STATEMENTS, HTTP_REQUEST_DB_SECONDS)
+
+logger = logging.getLogger(__name__)
+
+# Requests slower than this are logged with their SQL; unset disables it
+SLOW_REQUEST_SECONDS = float(os.getenv("SLOW_REQUEST_SECONDS", "0")) or None
+SLOW_REQUEST_MAX_QUERIES = int(os.getenv("SLOW_REQUEST_MAX_QUERIES", "50"))
+
+
+class RequestStats:
+    __slots__ = ("statements", "db_seconds", "queries")
+
+    def __init__(self, keep_queries: bool):
+        self.statements = 0
+        self.db_seconds = 0.0
+        self.queries: Optional[List[str]] = [] if keep_queries else None
+
+
+# Set per request by the middleware. Threadpool handlers and streaming
+# generators run in a copy of the request's context, so they update the
+# same RequestStats; work outside a request (bot, sweeper) sees None.
+_request_stats: ContextVar[Optional[RequestStats]] = ContextVar("request_stats", default=None)
+
+
+def _before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    if _request_stats.get() is not None:
+        conn.info.setdefault("query_started", []).append(time.perf_counter())
+
+
+def _after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    stats = _request_stats.get()
+    if stats is None or not conn.info.get("query_started"):
+        return
+    elapsed = time.perf_counter() - conn.info["query_started"].pop()
+    stats.statements += 1
+    stats.db_seconds += elapsed
+    if stats.queries is not None and len(stats.queries) < SLOW_REQUEST_MAX_QUERIES:
+        stats.queries.append(f"{elapsed * 1000:.1f}ms {' '.join(statement.split())}")
+
+
+def instrument_engine(engine):
+    """Count statements and DB time of `engine` (a sync Engine, or the
+    .sync_engine of an AsyncEngine) against the current request."""
+    event.listen(engine, "before_cursor_execute", _before_cursor_execute)
+    event.listen(engine, "after_cursor_execute", _after_cursor_execute)
+
+
+class RequestMetricsMiddleware:
+    """Pure ASGI middleware recording latency, in-flight requests and SQL
+    usage per route template.
+
+    Routes are labelled by their template (/organizations/{org_id}/users),
+    never the raw path, to keep label cardinality bounded.
+    """
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            return await self.app(scope, receive, send)
+
+        method = scope["method"]
+        status_code = 500
+        stats = RequestStats(keep_queries=SLOW_REQUEST_SECONDS is not None)
+        token = _request_stats.set(stats)
+
+        async def send_with_status(message):
+            nonlocal status_code
+            if message["type"] == "http.response.start":
+                status_code = message["status"]
+            await send(message)
+
+        in_flight = HTTP_REQUESTS_IN_FLIGHT.labels(method)
+        in_flight.inc()
+        started = time.perf_counter()
+        try:
+            await self.app(scope, receive, send_with_status)
+        finally:
+            elapsed = time.perf_counter() - started
+            in_flight.dec()
+            _request_stats.reset(token)
+
+            route = getattr(scope.get("route"), "path", "unmatched")
+            HTTP_REQUEST_SECONDS.labels(method, route, status_code).observe(elapsed)
+            HTTP_REQUEST_SQL_STATEMENTS.labels(method, route).observe(stats.statements)
+            HTTP_REQUEST_DB_SECONDS.labels(method, route).observe(stats.db_seconds)
+
+            if SLOW_REQUEST_SECONDS is not None and elapsed >= SLOW_REQUEST_SECONDS:
+                logger.warning(
+                    f"Slow request {method} {scope['path']} ({route}) -> {status_code}: "
+                    f"{elapsed * 1000:.0f}ms, {stats.statements} queries, "
+                    f"{stats.db_seconds * 1000:.0f}ms in DB"
+                    + "".join(f"\n  {query}" for query in stats.queries)
+                )
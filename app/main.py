@@ -1,30 +1,130 @@
-from fastapi import FastAPI, Depends
+import asyncio
+import logging
+import os
+from contextlib import asynccontextmanager, suppress
+from fastapi import APIRouter, FastAPI, Response
+from fastapi.concurrency import run_in_threadpool
 from fastapi.middleware.cors import CORSMiddleware
-from .database import engine, get_db
-from . import models
-from threading import Thread
-import uvicorn
+from fastapi.responses import JSONResponse
+from sqlalchemy import text
+from .database import get_async_engine, dispose_engines, schema_revisions
+from .metrics import render_metrics, mark_process_dead
 from .auth import router as auth_router
 from .organizations import router as org_router
-from bot import send_login_2fa_buttons
-models.Base.metadata.create_all(bind=engine)
+from .telegram import router as telegram_router, BOT_MODE, require_webhook_secret
+from .sweeper import run_sweeper, SWEEPER_ENABLED
+from .ephemeral import EPHEMERAL_BACKEND
+from .instrumentation import RequestMetricsMiddleware
+from .outbox import outbox
+from .notifications import login_notifier
 
-app = FastAPI()
+logger = logging.getLogger(__name__)
 
-app.include_router(auth_router)
-app.include_router(org_router)
+READY_TIMEOUT_SECONDS = float(os.getenv("READY_TIMEOUT_SECONDS", "2"))
+# How long shutdown waits for queued 2FA messages to go out
+OUTBOX_SHUTDOWN_TIMEOUT_SECONDS = float(os.getenv("OUTBOX_SHUTDOWN_TIMEOUT_SECONDS", "10"))
+# off | warn | strict: compare the database's Alembic revision with the
+# migrations head on startup; strict refuses to start on a mismatch
+SCHEMA_CHECK = os.getenv("SCHEMA_CHECK", "warn").lower()
 
-app.add_middleware(
-    CORSMiddleware,
-    allow_origins=["*"],
-    allow_credentials=True,
-    allow_methods=["*"],
-    allow_headers=["*"],
-)
+router = APIRouter()
 
-@app.get("/")
+def check_schema():
+    try:
+        current, heads = schema_revisions()
+    except Exception as e:
+        if SCHEMA_CHECK == "strict":
+            raise
+        logger.warning(f"Schema check skipped: {e}")
+        return
+
+    if current != heads:
+        message = (
+            f"Database is at revision {', '.join(sorted(current)) or 'none'}, "
+            f"migrations head is {', '.join(sorted(heads))}; run `alembic upgrade head`"
+        )
+        if SCHEMA_CHECK == "strict":
+            raise RuntimeError(message)
+        logger.warning(message)
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    require_webhook_secret()
+    if SCHEMA_CHECK != "off":
+        await run_in_threadpool(check_schema)
+    if BOT_MODE == "webhook":
+        # Updates arrive through /api/telegram/webhook instead of polling
+        from bot import setup_handlers
+        setup_handlers()
+
+    # Other ephemeral backends expire entries themselves
+    sweep = SWEEPER_ENABLED and EPHEMERAL_BACKEND == "database"
+    sweeper = asyncio.create_task(run_sweeper()) if sweep else None
+    # Confirmations from the bot process reach this worker's long polls
+    login_notifier.start()
+    yield
+    await run_in_threadpool(login_notifier.stop)
+    if sweeper:
+        sweeper.cancel()
+        with suppress(asyncio.CancelledError):
+            await sweeper
+    if BOT_MODE == "webhook":
+        # Updates the webhook accepted are handled before replies drain
+        from bot import update_dispatcher
+        await run_in_threadpool(update_dispatcher.stop, OUTBOX_SHUTDOWN_TIMEOUT_SECONDS)
+    await run_in_threadpool(outbox.stop, OUTBOX_SHUTDOWN_TIMEOUT_SECONDS)
+    await dispose_engines()
+    mark_process_dead(os.getpid())
+
+@router.get("/")
 async def status():
     return {"status": "alive"}
 
-def run_fastapi():
-    uvicorn.run("app.main:app", host="26.81.14.93", port=8080)
+@router.get("/ready")
+async def ready():
+    """Readiness probe: 503 unless a pooled connection answers SELECT 1
+    within READY_TIMEOUT_SECONDS."""
+    engine = get_async_engine()
+    pool = engine.pool
+    pool_status = {"checked_out": pool.checkedout()} if hasattr(pool, "checkedout") else {}
+
+    async def ping():
+        async with engine.connect() as conn:
+            await conn.execute(text("SELECT 1"))
+
+    try:
+        await asyncio.wait_for(ping(), READY_TIMEOUT_SECONDS)
+    except Exception as e:
+        return JSONResponse(
+            status_code=503,
+            content={"status": "unavailable", "database": str(e) or type(e).__name__, "pool": pool_status}
+        )
+    return {"status": "ready", "pool": pool_status}
+
+@router.get("/metrics")
+def metrics():
+    body, content_type = render_metrics()
+    return Response(body, media_type=content_type)
+
+def create_app() -> FastAPI:
+    """Assemble the API. Engines, the Telegram client and the schema check
+    are set up by the lifespan or on first use, never here."""
+    app = FastAPI(lifespan=lifespan)
+
+    app.include_router(router)
+    app.include_router(auth_router)
+    app.include_router(org_router)
+    app.include_router(telegram_router)
+
+    app.add_middleware(
+        CORSMiddleware,
+        allow_origins=["*"],
+        allow_credentials=True,
+        allow_methods=["*"],
+        allow_headers=["*"],
+    )
+    # Added last so it is outermost and times the whole middleware stack
+    app.add_middleware(RequestMetricsMiddleware)
+    return app
+
+app = create_app()
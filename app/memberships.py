@@ -0,0 +1,151 @@
+import os
+from dataclasses import dataclass, field
+from typing import Dict, FrozenSet, List, Sequence, Tuple
+
+from sqlalchemy import select
+from sqlalchemy.dialects import postgresql, sqlite
+from sqlalchemy.orm import Session
+
+from .cache import TTLCache
+from .enums import UserRole
+from .models import User, Department, UserOrganization, UserDepartmentRole
+
+MEMBERSHIP_CACHE_SIZE = int(os.getenv("MEMBERSHIP_CACHE_SIZE", "10000"))
+# Bounds how long another worker may serve a membership that was changed
+# elsewhere; writes in this process invalidate immediately.
+MEMBERSHIP_CACHE_TTL = float(os.getenv("MEMBERSHIP_CACHE_TTL", "60"))
+# Rows per INSERT statement and per transaction in import_memberships
+MEMBERSHIP_IMPORT_BATCH_SIZE = int(os.getenv("MEMBERSHIP_IMPORT_BATCH_SIZE", "1000"))
+
+
+@dataclass(frozen=True)
+class Memberships:
+    user_id: int
+    organizations: FrozenSet[int] = frozenset()
+    department_roles: Dict[int, UserRole] = field(default_factory=dict)
+
+    def is_member(self, org_id: int) -> bool:
+        return org_id in self.organizations
+
+    def role_in(self, dep_id: int):
+        return self.department_roles.get(dep_id)
+
+
+_cache = TTLCache(maxsize=MEMBERSHIP_CACHE_SIZE, ttl=MEMBERSHIP_CACHE_TTL)
+
+
+def load_memberships(db: Session, user_id: int) -> Memberships:
+    memberships = _cache.get(user_id)
+    if memberships is not None:
+        return memberships
+
+    org_ids = db.query(UserOrganization.organization_id).filter(
+        UserOrganization.user_id == user_id
+    ).all()
+    roles = db.query(UserDepartmentRole.department_id, UserDepartmentRole.role).filter(
+        UserDepartmentRole.user_id == user_id
+    ).all()
+
+    memberships = Memberships(
+        user_id=user_id,
+        organizations=frozenset(row.organization_id for row in org_ids),
+        department_roles={row.department_id: row.role for row in roles}
+    )
+    _cache.set(user_id, memberships)
+    return memberships
+
+
+def invalidate_memberships(*user_ids: int):
+    for user_id in user_ids:
+        _cache.pop(user_id)
+
+
+def _insert_ignoring_conflicts(db: Session, model):
+    dialect = db.get_bind().dialect.name
+    if dialect == "postgresql":
+        return postgresql.insert(model).on_conflict_do_nothing()
+    if dialect == "sqlite":
+        return sqlite.insert(model).on_conflict_do_nothing()
+    raise NotImplementedError(f"Bulk membership import is not supported on {dialect}")
+
+
+def _import_batch(db: Session, org_id: int, org_departments: FrozenSet[int], batch) -> List[dict]:
+    emails = {row.email for _, row in batch if row.user_id is None and row.email}
+    ids_by_email = dict(db.execute(
+        select(User.email, User.id).where(User.email.in_(emails))
+    ).all()) if emails else {}
+
+    requested_ids = {row.user_id for _, row in batch if row.user_id is not None}
+    known_ids = set(db.scalars(
+        select(User.id).where(User.id.in_(requested_ids))
+    )) if requested_ids else set()
+    known_ids.update(ids_by_email.values())
+
+    results, accepted, seen = [], [], set()
+    for number, row in batch:
+        user_id = row.user_id if row.user_id is not None else ids_by_email.get(row.email)
+        result = {"row": number, "user_id": user_id, "department_id": row.department_id}
+        results.append(result)
+
+        if user_id not in known_ids:
+            result.update(status="failed", error="Unknown user")
+        elif row.department_id is not None and row.department_id not in org_departments:
+            result.update(status="failed", error="Department not in organization")
+        elif (user_id, row.department_id) in seen:
+            result["status"] = "duplicate"
+        else:
+            seen.add((user_id, row.department_id))
+            accepted.append((result, row))
+
+    # Department members are organization members too, so every accepted
+    # user goes into user_organizations.
+    user_ids = {result["user_id"] for result, _ in accepted}
+    joined_org = set()
+    if user_ids:
+        joined_org = set(db.scalars(
+            _insert_ignoring_conflicts(db, UserOrganization).values([
+                {"user_id": user_id, "organization_id": org_id} for user_id in user_ids
+            ]).returning(UserOrganization.user_id)
+        ))
+
+    roles = [
+        {"user_id": result["user_id"], "department_id": row.department_id, "role": row.role}
+        for result, row in accepted if row.department_id is not None
+    ]
+    joined_department = set()
+    if roles:
+        joined_department = set(db.execute(
+            _insert_ignoring_conflicts(db, UserDepartmentRole).values(roles).returning(
+                UserDepartmentRole.user_id, UserDepartmentRole.department_id
+            )
+        ).tuples())
+
+    for result, row in accepted:
+        if row.department_id is None:
+            added = result["user_id"] in joined_org
+        else:
+            added = (result["user_id"], row.department_id) in joined_department
+        result["status"] = "added" if added else "exists"
+
+    db.commit()
+    return results
+
+
+def import_memberships(db: Session, org_id: int, rows: Sequence[Tuple[int, object]]) -> List[dict]:
+    """Add users to an organization and its departments in bulk.
+
+    `rows` are (row number, MembershipImportRow) pairs. Every batch of
+    MEMBERSHIP_IMPORT_BATCH_SIZE rows costs two lookups and two
+    multi-row INSERT ... ON CONFLICT DO NOTHING statements, and is
+    committed on its own. Existing memberships are kept as they are,
+    including their role, and reported as "exists". Returns one result
+    dict per row, in input order.
+    """
+    org_departments = frozenset(db.scalars(
+        select(Department.id).where(Department.organization_id == org_id)
+    ))
+    results = []
+    for start in range(0, len(rows), MEMBERSHIP_IMPORT_BATCH_SIZE):
+        batch = rows[start:start + MEMBERSHIP_IMPORT_BATCH_SIZE]
+        results.extend(_import_batch(db, org_id, org_departments, batch))
+    return results
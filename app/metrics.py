@@ -0,0 +1,134 @@
+import os
+
+from prometheus_client import (CONTENT_TYPE_LATEST, CollectorRegistry, Counter,
+    Gauge, Histogram, REGISTRY, generate_latest, multiprocess)
+
+# Set by run.py when several processes serve the API: every process then
+# writes its samples to files in this directory and /metrics merges them.
+# Gauges sum over live processes.
+PROMETHEUS_MULTIPROC_DIR = os.getenv("PROMETHEUS_MULTIPROC_DIR")
+
+OUTBOX_QUEUE_DEPTH = Gauge(
+    "telegram_outbox_queue_depth",
+    "Telegram messages waiting to be sent",
+    multiprocess_mode="livesum"
+)
+OUTBOX_SEND_SECONDS = Histogram(
+    "telegram_outbox_send_seconds",
+    "Duration of a single Telegram send call"
+)
+OUTBOX_DELIVERY_SECONDS = Histogram(
+    "telegram_outbox_delivery_seconds",
+    "Time from enqueue to successful delivery, including rate limiting and retries",
+    buckets=(0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60)
+)
+OUTBOX_MESSAGES = Counter(
+    "telegram_outbox_messages_total",
+    "Telegram messages handled by the outbox",
+    ["result"]
+)
+
+UPDATES_IN_FLIGHT = Gauge(
+    "telegram_updates_in_flight",
+    "Telegram updates queued or being handled by the bot's workers",
+    multiprocess_mode="livesum"
+)
+UPDATE_WAIT_SECONDS = Histogram(
+    "telegram_update_wait_seconds",
+    "Time an update waited for its chat's worker after being received",
+    buckets=(0.001, 0.005, 0.01, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30)
+)
+UPDATE_LAG_SECONDS = Histogram(
+    "telegram_update_lag_seconds",
+    "Time from Telegram's message timestamp (whole seconds) to the handler finishing",
+    ["kind"],
+    buckets=(0.5, 1, 2, 3, 5, 10, 30, 60, 300)
+)
+UPDATE_HANDLE_SECONDS = Histogram(
+    "telegram_update_handle_seconds",
+    "Duration of the bot handlers for one update",
+    ["kind"]
+)
+UPDATES = Counter(
+    "telegram_updates_total",
+    "Telegram updates handled by the bot",
+    ["kind", "result"]
+)
+
+DB_POOL_CHECKOUT_SECONDS = Histogram(
+    "db_pool_checkout_seconds",
+    "Time spent waiting for a connection from the pool",
+    ["pool"],
+    buckets=(0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30)
+)
+DB_POOL_CHECKOUT_TIMEOUTS = Counter(
+    "db_pool_checkout_timeouts_total",
+    "Pool checkouts that gave up after DB_POOL_TIMEOUT",
+    ["pool"]
+)
+DB_POOL_CHECKED_OUT = Gauge(
+    "db_pool_checked_out",
+    "Connections currently checked out of the pool",
+    ["pool"],
+    multiprocess_mode="livesum"
+)
+DB_POOL_CAPACITY = Gauge(
+    "db_pool_capacity",
+    "Maximum connections the pool may hold (its share of DB_POOL_SIZE plus DB_MAX_OVERFLOW); summed over pools it is the process budget",
+    ["pool"],
+    multiprocess_mode="livesum"
+)
+
+SWEEPER_ROWS = Counter(
+    "sweeper_rows_deleted_total",
+    "Expired rows deleted by the background sweeper",
+    ["table"]
+)
+SWEEPER_SECONDS = Histogram(
+    "sweeper_duration_seconds",
+    "Duration of one sweep over all expiring tables"
+)
+SWEEPER_ERRORS = Counter(
+    "sweeper_errors_total",
+    "Sweeps that failed with an exception"
+)
+
+HTTP_REQUEST_SECONDS = Histogram(
+    "http_request_duration_seconds",
+    "HTTP request latency by route template",
+    ["method", "route", "status"],
+    buckets=(0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30)
+)
+HTTP_REQUESTS_IN_FLIGHT = Gauge(
+    "http_requests_in_flight",
+    "HTTP requests currently being served",
+    ["method"],
+    multiprocess_mode="livesum"
+)
+HTTP_REQUEST_SQL_STATEMENTS = Histogram(
+    "http_request_sql_statements",
+    "SQL statements executed while serving one request",
+    ["method", "route"],
+    buckets=(0, 1, 2, 3, 5, 10, 20, 50, 100, 250)
+)
+HTTP_REQUEST_DB_SECONDS = Histogram(
+    "http_request_db_seconds",
+    "Time spent executing SQL while serving one request",
+    ["method", "route"],
+    buckets=(0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10)
+)
+
+
+def render_metrics():
+    """(body, content type) for the /metrics endpoint."""
+    registry = REGISTRY
+    if PROMETHEUS_MULTIPROC_DIR:
+        registry = CollectorRegistry()
+        multiprocess.MultiProcessCollector(registry)
+    return generate_latest(registry), CONTENT_TYPE_LATEST
+
+
+def mark_process_dead(pid: int):
+    """Drop an exiting process's live gauges from the merged view."""
+    if PROMETHEUS_MULTIPROC_DIR:
+        multiprocess.mark_process_dead(pid)
@@ -1,8 +1,8 @@
 from sqlalchemy import (Column, Integer, String, Text,
-    ForeignKey, TIMESTAMP, Enum, Boolean, DateTime)
+    ForeignKey, TIMESTAMP, Enum, Boolean, DateTime, Index, text)
 from sqlalchemy.sql import func
 from .database import Base
-from .enums import UserRole, DocumentStatus, InviteStatus
+from .enums import UserRole, DocumentStatus, SignatureStatus, InviteStatus
 from datetime import datetime, timedelta
 from sqlalchemy.orm import relationship
 
@@ -16,6 +16,15 @@ class User(Base):
     password_hash = Column(Text, nullable=False)
     telegram_id =  Column(String(30))
 
+    # Trigram indexes behind search_users (pg_trgm)
+    __table_args__ = tuple(
+        Index(
+            f"ix_users_{column}_trgm", column,
+            postgresql_using="gin",
+            postgresql_ops={column: "gin_trgm_ops"}
+        ) for column in ("name", "email", "phone")
+    )
+
 class Organization(Base):
     __tablename__ = "organizations"
 
@@ -30,12 +39,20 @@ class Department(Base):
     name = Column(String(255), nullable=False)
     organization_id = Column(Integer, ForeignKey("organizations.id", ondelete="CASCADE"))
 
+    __table_args__ = (
+        Index("ix_departments_organization_id", "organization_id"),
+    )
+
 class UserOrganization(Base):
     __tablename__ = "user_organizations"
 
     user_id = Column(Integer, ForeignKey("users.id", ondelete="CASCADE"), primary_key=True)
     organization_id = Column(Integer, ForeignKey("organizations.id", ondelete="CASCADE"), primary_key=True)
 
+    __table_args__ = (
+        Index("ix_user_organizations_organization_id", "organization_id"),
+    )
+
 class UserDepartmentRole(Base):
     __tablename__ = "user_department_roles"
 
@@ -43,6 +60,10 @@ class UserDepartmentRole(Base):
     department_id = Column(Integer, ForeignKey("departments.id", ondelete="CASCADE"), primary_key=True)
     role = Column(Enum(UserRole), nullable=False)
 
+    __table_args__ = (
+        Index("ix_user_department_roles_department_id", "department_id"),
+    )
+
 class Document(Base):
     __tablename__ = "documents"
 
@@ -52,7 +73,17 @@ class Document(Base):
     sender_id = Column(Integer, ForeignKey("users.id", ondelete="SET NULL"))
     organization_id = Column(Integer, ForeignKey("organizations.id", ondelete="CASCADE"))
     status = Column(Enum(DocumentStatus), default=DocumentStatus.DRAFT)
-    created_at = Column(TIMESTAMP, server_default=func.now())
+    # Set by the client so every row has the same stored format as the
+    # inbox cursor that is compared with it; on SQLite the server default
+    # drops the microseconds and the keyset would repeat same-second rows
+    created_at = Column(TIMESTAMP, default=datetime.now, server_default=func.now())
+    # Signatures still pending, maintained by create_documents/sign_document
+    pending_signatures = Column(Integer, nullable=False, default=0, server_default="0")
+
+    __table_args__ = (
+        Index("ix_documents_sender_id_created_at", "sender_id", "created_at", "id"),
+        Index("ix_documents_organization_id", "organization_id"),
+    )
 
 class Signature(Base):
     __tablename__ = "signatures"
@@ -60,11 +91,19 @@ class Signature(Base):
     id = Column(Integer, primary_key=True, index=True)
     document_id = Column(Integer, ForeignKey("documents.id", ondelete="CASCADE"))
     signer_id = Column(Integer, ForeignKey("users.id", ondelete="CASCADE"))
-    signature_hash = Column(Text, nullable=False)
+    status = Column(Enum(SignatureStatus), nullable=False, default=SignatureStatus.PENDING)
+    signature_hash = Column(Text)
     signed_at = Column(TIMESTAMP)
     confirmed_via = Column(String(20))
 
     __table_args__ = (
+        Index("ix_signatures_signer_id_document_id", "signer_id", "document_id"),
+        Index("ix_signatures_document_id", "document_id"),
+        Index(
+            "ix_signatures_document_id_pending", "document_id",
+            postgresql_where=text("status = 'PENDING'"),
+            sqlite_where=text("status = 'PENDING'")
+        ),
         {'sqlite_autoincrement': True},
     )
 
@@ -80,6 +119,10 @@ class LoginSession(Base):
 
     user = relationship("User")
 
+    __table_args__ = (
+        Index("ix_login_sessions_expires_at", "expires_at"),
+    )
+
 class Invite(Base):
     __tablename__ = "invites"
 
@@ -94,7 +137,13 @@ class ConfirmationCode(Base):
 
     id = Column(Integer, primary_key=True)
     email = Column(String(255), nullable=False)
-    code = Column(String(6), nullable=True)
+    code = Column(String(64), nullable=True)
     expires_at = Column(TIMESTAMP, default=lambda: datetime.now() + timedelta(minutes=15))
     is_used = Column(Boolean, default=False)
     telegram_verified = Column(Boolean, default=False)
+
+    __table_args__ = (
+        Index("ix_confirmation_codes_email", "email"),
+        Index("ix_confirmation_codes_expires_at", "expires_at"),
+        Index("ix_confirmation_codes_code", "code", unique=True),
+    )
@@ -0,0 +1,205 @@
+import asyncio
+import logging
+import os
+import select
+import threading
+from contextlib import contextmanager
+from typing import Callable, Dict, List, Optional, Tuple
+
+from sqlalchemy import text
+from sqlalchemy.engine import make_url
+
+from .database import SessionLocal, SQLALCHEMY_DATABASE_URL, get_engine
+from .ephemeral import EPHEMERAL_BACKEND, EPHEMERAL_REDIS_PREFIX, ephemeral_store
+
+logger = logging.getLogger(__name__)
+
+# Postgres channel / Redis pub/sub channel (the latter gets the Redis prefix)
+LOGIN_NOTIFY_CHANNEL = os.getenv("LOGIN_NOTIFY_CHANNEL", "login_sessions")
+# How often a listener checks for shutdown, and waits before reconnecting
+LOGIN_NOTIFY_POLL_SECONDS = 1.0
+
+
+class LoginNotifier:
+    """Wakes up long-polling verify-login requests as soon as the bot
+    confirms or rejects their login session.
+
+    The bot usually runs in another process than the API worker holding
+    the request, so with a `broadcast` publish goes through Redis pub/sub
+    or Postgres NOTIFY, and a listener thread in each API process delivers
+    it to the local waiters. Without one, only waiters in the publishing
+    process are woken; the others notice on their periodic recheck.
+
+    Waiters are resolved through their event loop with
+    call_soon_threadsafe, since publishers and listeners are threads.
+    """
+
+    def __init__(self, broadcast=None):
+        self._lock = threading.Lock()
+        self._waiters: Dict[str, List[Tuple[asyncio.AbstractEventLoop, asyncio.Future]]] = {}
+        self._broadcast = broadcast
+        self._stop = threading.Event()
+        self._listener: Optional[threading.Thread] = None
+
+    def start(self):
+        """Start listening for other processes' notifications. Called by
+        the API lifespan; publish-only processes such as the bot skip it."""
+        if self._broadcast is None or self._listener is not None:
+            return
+        self._stop.clear()
+        self._listener = threading.Thread(
+            target=self._broadcast.listen, args=(self.deliver, self._stop),
+            name="login-notifier", daemon=True
+        )
+        self._listener.start()
+
+    def stop(self, timeout: Optional[float] = None):
+        if self._listener is None:
+            return
+        self._stop.set()
+        self._listener.join(timeout)
+        self._listener = None
+
+    @contextmanager
+    def subscribe(self, session_token: str):
+        """Register a waiter for the block and yield the future it resolves.
+        Subscribing before reading the session state means a notification
+        published in between is not lost."""
+        loop = asyncio.get_running_loop()
+        future = loop.create_future()
+        waiter = (loop, future)
+
+        with self._lock:
+            self._waiters.setdefault(session_token, []).append(waiter)
+        try:
+            yield future
+        finally:
+            with self._lock:
+                waiters = self._waiters.get(session_token)
+                if waiters and waiter in waiters:
+                    waiters.remove(waiter)
+                    if not waiters:
+                        del self._waiters[session_token]
+
+    async def wait(self, session_token: str, timeout: float) -> Optional[bool]:
+        """Return True/False once the session is confirmed/rejected,
+        or None if nothing happened within `timeout` seconds."""
+        with self.subscribe(session_token) as notified:
+            return await wait_notified(notified, timeout)
+
+    def publish(self, session_token: str, confirmed: bool):
+        if self._broadcast is not None:
+            try:
+                self._broadcast.publish(session_token, confirmed)
+                return
+            except Exception as e:
+                # Remote waiters still see the change on their recheck
+                logger.warning(f"Login notification not broadcast: {e}")
+        self.deliver(session_token, confirmed)
+
+    def deliver(self, session_token: str, confirmed: bool):
+        with self._lock:
+            waiters = self._waiters.pop(session_token, [])
+        for loop, future in waiters:
+            loop.call_soon_threadsafe(_resolve, future, confirmed)
+
+
+async def wait_notified(notified: asyncio.Future, timeout: float) -> Optional[bool]:
+    try:
+        return await asyncio.wait_for(notified, timeout)
+    except asyncio.TimeoutError:
+        return None
+
+
+def _resolve(future: asyncio.Future, confirmed: bool):
+    if not future.done():
+        future.set_result(confirmed)
+
+
+def _encode(session_token: str, confirmed: bool) -> str:
+    return f"{int(confirmed)}:{session_token}"
+
+
+def _decode(payload: str) -> Tuple[str, bool]:
+    confirmed, session_token = payload.split(":", 1)
+    return session_token, confirmed == "1"
+
+
+class RedisLoginBroadcast:
+    """Pub/sub on the Redis instance that already holds the sessions."""
+
+    def __init__(self, client, channel: str):
+        self.client = client
+        self.channel = channel
+
+    def publish(self, session_token: str, confirmed: bool):
+        self.client.publish(self.channel, _encode(session_token, confirmed))
+
+    def listen(self, deliver: Callable[[str, bool], None], stop: threading.Event):
+        while not stop.is_set():
+            pubsub = self.client.pubsub(ignore_subscribe_messages=True)
+            try:
+                pubsub.subscribe(self.channel)
+                while not stop.is_set():
+                    message = pubsub.get_message(timeout=LOGIN_NOTIFY_POLL_SECONDS)
+                    if message and message["type"] == "message":
+                        data = message["data"]
+                        deliver(*_decode(data.decode() if isinstance(data, bytes) else data))
+            except Exception as e:
+                logger.warning(f"Login notification listener reconnecting: {e}")
+                stop.wait(LOGIN_NOTIFY_POLL_SECONDS)
+            finally:
+                pubsub.close()
+
+
+class PostgresLoginBroadcast:
+    """LISTEN/NOTIFY on the application database. The listener holds one
+    connection per API process outside the pool budget."""
+
+    def __init__(self, channel: str, session_factory=SessionLocal):
+        self.channel = channel
+        self.session_factory = session_factory
+
+    def publish(self, session_token: str, confirmed: bool):
+        with self.session_factory() as db:
+            db.execute(text("SELECT pg_notify(:channel, :payload)"),
+                       {"channel": self.channel, "payload": _encode(session_token, confirmed)})
+            db.commit()
+
+    def listen(self, deliver: Callable[[str, bool], None], stop: threading.Event):
+        while not stop.is_set():
+            connection = None
+            try:
+                connection = get_engine().raw_connection()
+                connection.detach()
+                conn = connection.driver_connection
+                conn.autocommit = True
+                with conn.cursor() as cursor:
+                    cursor.execute(f'LISTEN "{self.channel}"')
+                while not stop.is_set():
+                    if select.select([conn], [], [], LOGIN_NOTIFY_POLL_SECONDS)[0]:
+                        conn.poll()
+                        while conn.notifies:
+                            deliver(*_decode(conn.notifies.pop(0).payload))
+            except Exception as e:
+                logger.warning(f"Login notification listener reconnecting: {e}")
+                stop.wait(LOGIN_NOTIFY_POLL_SECONDS)
+            finally:
+                if connection is not None:
+                    connection.close()
+
+
+def create_broadcast():
+    """Redis when the sessions live there, Postgres NOTIFY when they live
+    in a Postgres database, nothing otherwise (the memory backend is
+    single-process anyway, and SQLite has no notifications)."""
+    if EPHEMERAL_BACKEND == "redis":
+        return RedisLoginBroadcast(ephemeral_store.client,
+                                   f"{EPHEMERAL_REDIS_PREFIX}{LOGIN_NOTIFY_CHANNEL}")
+    if EPHEMERAL_BACKEND == "database" and \
+            make_url(SQLALCHEMY_DATABASE_URL).get_backend_name() == "postgresql":
+        return PostgresLoginBroadcast(LOGIN_NOTIFY_CHANNEL)
+    return None
+
+
+login_notifier = LoginNotifier(create_broadcast())
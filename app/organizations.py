@@ -1,50 +1,86 @@
-from fastapi import APIRouter, Depends, HTTPException, Path
+from fastapi import APIRouter, Depends, File, HTTPException, Path, Query, Request, UploadFile, status
+from sqlalchemy import select, func
 from sqlalchemy.orm import Session
-from .database import get_db
+from sqlalchemy.ext.asyncio import AsyncSession
+from .database import get_db, get_async_db
 from .schemas import (
     OrganizationsResponse, DepartmentsResponse,
-    UsersResponse, DocumentIdResponse,
+    UsersResponse, DocumentIdResponse, DocumentIdsResponse,
     SearchUserRequest, AddUserRequest,
-    CreateDocumentRequest, SubscribeDocumentRequest,
-    DocumentsResponse, SuccessResponse
+    CreateDocumentRequest, CreateDocumentsRequest, SubscribeDocumentRequest,
+    DocumentListRequest, MembershipImportRow, MembershipImportRequest,
+    MembershipImportResponse, DocumentsResponse, SuccessResponse
 )
 from .models import (
     Organization, Department, User,
-    UserOrganization, UserDepartmentRole,
-    Document, Signature
+    UserOrganization, UserDepartmentRole
 )
 from .auth import oauth2_scheme
-from pydantic import BaseModel
+from .documents import (create_documents, recipients_exist,
+    inbox_query, encode_cursor, sign_document)
+from . import search
+from . import response_cache
+from . import exports
+from .response_cache import CachedResponse
+from .memberships import (Memberships, load_memberships, invalidate_memberships,
+    import_memberships)
+from pydantic import BaseModel, Field, ValidationError
+from typing import List, Optional
+import csv
+import io
 from jose import JWTError, jwt
-from dotenv import load_dotenv
 import os
-load_dotenv()
-
 router = APIRouter(prefix="/api/organizations")
 SECRET_KEY = os.getenv("JWT_SECRET_KEY", "mega-secret-key")
 ALGORITHM = os.getenv("JWT_ALGORITHM", "HS256")
 
 
-def verify_token(token: str = Depends(oauth2_scheme), db: Session = Depends(get_db)):
+def decode_token(token: str) -> dict:
     try:
         payload = jwt.decode(token, SECRET_KEY, algorithms=[ALGORITHM])
-        email = payload.get("sub")
-        user = db.query(User).filter(User.email == email).first()
+    except JWTError:
+        raise HTTPException(
+            status_code=status.HTTP_401_UNAUTHORIZED,
+            detail="Invalid token"
+        )
+    if payload.get("sub") is None:
+        raise HTTPException(
+            status_code=status.HTTP_401_UNAUTHORIZED,
+            detail="Invalid token"
+        )
+    return payload
+
+def verify_token(token: str = Depends(oauth2_scheme), db: Session = Depends(get_db)):
+    payload = decode_token(token)
+    user_id = payload.get("uid")
+
+    if user_id is None:
+        # Tokens issued before the uid claim still need a lookup
+        user = db.query(User).filter(User.email == payload["sub"]).first()
         if not user:
             raise HTTPException(
                 status_code=status.HTTP_401_UNAUTHORIZED,
                 detail="User not found"
             )
+        user_id = user.id
 
-        return {
-            "user_id": user.id,  
-            "is_admin": payload.get("is_admin", False)
-        }
-    except JWTError:
-        raise HTTPException(
-            status_code=status.HTTP_401_UNAUTHORIZED,
-            detail="Invalid token"
-        )
+    return {
+        "user_id": user_id,
+        "is_admin": payload.get("is_admin", False)
+    }
+
+def get_memberships(
+    token_data: dict = Depends(verify_token),
+    db: Session = Depends(get_db)
+) -> Memberships:
+    return load_memberships(db, token_data["user_id"])
+
+def cached(namespace: str):
+    """Dependency serving the endpoint from the response cache. Declare it
+    before any dependency that touches the database so a 304 skips them."""
+    def dependency(request: Request, token_data: dict = Depends(verify_token)) -> CachedResponse:
+        return response_cache.lookup(request, namespace, token_data["user_id"])
+    return dependency
 
 class NewOrganizationRequest(BaseModel):
     name: str
@@ -53,74 +89,162 @@ class NewOrganizationRequest(BaseModel):
 class NewDepartmentRequest(BaseModel):
     name: str
 
-def get_current_user(db: Session, token: str):
-    try:
-        payload = jwt.decode(token, SECRET_KEY, algorithms=["HS256"])
-        email = payload.get("sub")
-        if email is None:
-            raise HTTPException(status_code=401, detail="Invalid token")
-        user = db.query(User).filter(User.email == email).first()
+class OrganizationSummaryRequest(BaseModel):
+    org_ids: List[int] = Field(..., min_length=1, max_length=500)
+
+def organization_summary_query(org_ids):
+    """Organizations with their department and employee counts, one row
+    per org, computed in a single statement."""
+    dept_counts = select(
+        Department.organization_id,
+        func.count().label("departments_count")
+    ).where(
+        Department.organization_id.in_(org_ids)
+    ).group_by(Department.organization_id).subquery()
+
+    emp_counts = select(
+        UserOrganization.organization_id,
+        func.count().label("employees_count")
+    ).where(
+        UserOrganization.organization_id.in_(org_ids)
+    ).group_by(UserOrganization.organization_id).subquery()
+
+    return select(
+        Organization.id,
+        Organization.name,
+        func.coalesce(dept_counts.c.departments_count, 0).label("departments_count"),
+        func.coalesce(emp_counts.c.employees_count, 0).label("employees_count")
+    ).outerjoin(
+        dept_counts, dept_counts.c.organization_id == Organization.id
+    ).outerjoin(
+        emp_counts, emp_counts.c.organization_id == Organization.id
+    ).where(
+        Organization.id.in_(org_ids)
+    ).order_by(Organization.id)
+
+def department_summary_query(org_id: int, dep_id: Optional[int] = None):
+    """Departments of an organization (or just `dep_id`) with their
+    employee counts."""
+    emp_counts = select(
+        UserDepartmentRole.department_id,
+        func.count().label("employees_count")
+    ).join(
+        Department, Department.id == UserDepartmentRole.department_id
+    ).where(
+        Department.organization_id == org_id
+    )
+    if dep_id is not None:
+        emp_counts = emp_counts.where(UserDepartmentRole.department_id == dep_id)
+    emp_counts = emp_counts.group_by(UserDepartmentRole.department_id).subquery()
+
+    query = select(
+        Department.id,
+        Department.name,
+        func.coalesce(emp_counts.c.employees_count, 0).label("employees_count")
+    ).outerjoin(
+        emp_counts, emp_counts.c.department_id == Department.id
+    ).where(
+        Department.organization_id == org_id
+    )
+    if dep_id is not None:
+        query = query.where(Department.id == dep_id)
+    return query.order_by(Department.id)
+
+def _organization_summary(row):
+    return {
+        "id": row.id,
+        "name": row.name,
+        "departments_count": row.departments_count,
+        "employees_count": row.employees_count
+    }
+
+def _department_summary(row):
+    return {
+        "id": row.id,
+        "name": row.name,
+        "employees_count": row.employees_count
+    }
+
+async def get_current_user(db: AsyncSession, token: str):
+    payload = decode_token(token)
+    user_id = payload.get("uid")
+
+    if user_id is None:
+        user = await db.scalar(select(User).where(User.email == payload["sub"]))
         if user is None:
             raise HTTPException(status_code=401, detail="User not found")
-        return user
-    except JWTError:
-        raise HTTPException(status_code=401, detail="Invalid token")
+        user_id = user.id
+
+    return {
+        "user_id": user_id,
+        "is_admin": payload.get("is_admin", False)
+    }
 
 @router.post("/new")
 async def create_organization(
     request: NewOrganizationRequest,
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_async_db)
 ):
-    user = get_current_user(db, request.token)
+    user = await get_current_user(db, request.token)
 
-    org = Organization(name=request.name, owner_id=user.id)
+    org = Organization(name=request.name, owner_id=user["user_id"])
     db.add(org)
-    db.commit()
-    db.refresh(org)
+    await db.flush()
 
-    user_org = UserOrganization(user_id=user.id, organization_id=org.id)
+    user_org = UserOrganization(user_id=user["user_id"], organization_id=org.id)
     db.add(user_org)
-    db.commit()
+    await db.commit()
+    invalidate_memberships(user["user_id"])
+    response_cache.invalidate(org_ids=[org.id], user_ids=[user["user_id"]])
 
     return {"status": "success", "id": org.id}
 
 @router.get("/{org_id}")
-async def get_organization(org_id: int, db: Session = Depends(get_db)):
-    org = db.query(Organization).filter(Organization.id == org_id).first()
-    if not org:
+async def get_organization(
+    org_id: int,
+    memberships: Memberships = Depends(get_memberships),
+    db: AsyncSession = Depends(get_async_db)
+):
+    if not memberships.is_member(org_id):
+        raise HTTPException(status_code=404, detail="Organization not found")
+    row = (await db.execute(organization_summary_query([org_id]))).first()
+    if not row:
         raise HTTPException(status_code=404, detail="Organization not found")
 
-    dept_count = db.query(Department).filter(
-        Department.organization_id == org_id
-    ).count()
+    return {
+        "organizations": [_organization_summary(row)]
+    }
 
-    emp_count = db.query(UserOrganization).filter(
-        UserOrganization.organization_id == org_id
-    ).count()
+@router.post("/summary")
+async def get_organizations_summary(
+    request: OrganizationSummaryRequest,
+    memberships: Memberships = Depends(get_memberships),
+    db: AsyncSession = Depends(get_async_db)
+):
+    # Organizations the caller does not belong to are silently left out
+    org_ids = [org_id for org_id in request.org_ids if memberships.is_member(org_id)]
+    if not org_ids:
+        return {"organizations": []}
+    rows = (await db.execute(organization_summary_query(org_ids))).all()
 
     return {
-        "organizations": [{
-            "id": org.id,
-            "name": org.name,
-            "departments_count": dept_count,
-            "employees_count": emp_count
-        }]
+        "organizations": [_organization_summary(row) for row in rows]
     }
 
 @router.post("/{org_id}/departments/new")
 async def create_department(
     org_id: int,
     request: NewDepartmentRequest,
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_async_db)
 ):
-    org = db.query(Organization).filter(Organization.id == org_id).first()
+    org = await db.get(Organization, org_id)
     if not org:
         raise HTTPException(status_code=404, detail="Organization not found")
 
     dept = Department(name=request.name, organization_id=org_id)
     db.add(dept)
-    db.commit()
-    db.refresh(dept)
+    await db.commit()
+    response_cache.invalidate(org_ids=[org_id])
 
     return {
         "success": True,
@@ -128,38 +252,48 @@ async def create_department(
         "id_depatrament": dept.id
     }
 
+@router.get("/{org_id}/departments/summary")
+async def get_departments_summary(
+    org_id: int,
+    memberships: Memberships = Depends(get_memberships),
+    db: AsyncSession = Depends(get_async_db)
+):
+    require_member(memberships, org_id)
+    rows = (await db.execute(department_summary_query(org_id))).all()
+
+    return {
+        "departaments": [_department_summary(row) for row in rows]
+    }
+
 @router.get("/{org_id}/departments/{dep_id}")
 async def get_department(
     org_id: int,
     dep_id: int,
-    db: Session = Depends(get_db)
+    memberships: Memberships = Depends(get_memberships),
+    db: AsyncSession = Depends(get_async_db)
 ):
-    dept = db.query(Department).filter(
-        Department.id == dep_id,
-        Department.organization_id == org_id
-    ).first()
+    require_member(memberships, org_id)
+    row = (await db.execute(
+        department_summary_query(org_id, dep_id)
+    )).first()
 
-    if not dept:
+    if not row:
         raise HTTPException(status_code=404, detail="Department not found")
 
-    emp_count = db.query(UserDepartmentRole).filter(
-        UserDepartmentRole.department_id == dep_id
-    ).count()
-
     return {
-        "departaments": [{
-            "id": dept.id,
-            "name": dept.name,
-            "employees_count": emp_count
-        }]
+        "departaments": [_department_summary(row)]
     }
 
 
 @router.post("/organizations/get", response_model=OrganizationsResponse)
 def get_user_organizations(
+    cache: CachedResponse = Depends(cached("user_organizations")),
     token_data: dict = Depends(verify_token),
     db: Session = Depends(get_db)
 ):
+    if cache.hit:
+        return cache.hit
+
     user_id = token_data["user_id"]
     orgs = db.query(Organization).join(
         UserOrganization,
@@ -168,54 +302,52 @@ def get_user_organizations(
         UserOrganization.user_id == user_id
     ).all()
 
-    return OrganizationsResponse(
+    return cache.store(OrganizationsResponse(
         success=True,
         organizations=[{"org_id": org.id, "name": org.name} for org in orgs]
-    )
+    ))
 
 @router.post("/organizations/{org_id}/departments/get", response_model=DepartmentsResponse)
 def get_organization_departments(
     org_id: int = Path(..., title="Organization ID"),
-    token_data: dict = Depends(verify_token),
+    cache: CachedResponse = Depends(cached("organization_departments")),
+    memberships: Memberships = Depends(get_memberships),
     db: Session = Depends(get_db)
 ):
-    user_org = db.query(UserOrganization).filter(
-        UserOrganization.user_id == token_data["user_id"],
-        UserOrganization.organization_id == org_id
-    ).first()
+    if cache.hit:
+        return cache.hit
 
-    if not user_org:
-        return DepartmentsResponse(
+    if not memberships.is_member(org_id):
+        return cache.store(DepartmentsResponse(
             success=False,
             error="Organization not found or access denied"
-        )
+        ))
 
     departments = db.query(Department).filter(
         Department.organization_id == org_id
     ).all()
 
-    return DepartmentsResponse(
+    return cache.store(DepartmentsResponse(
         success=True,
         departments=[{"dep_id": dep.id, "name": dep.name} for dep in departments]
-    )
+    ))
 
 @router.post("/organizations/{org_id}/departments/{dep_id}/users", response_model=UsersResponse)
 def get_department_users(
     org_id: int = Path(..., title="Organization ID"),
     dep_id: int = Path(..., title="Department ID"),
-    token_data: dict = Depends(verify_token),
+    cache: CachedResponse = Depends(cached("department_users")),
+    memberships: Memberships = Depends(get_memberships),
     db: Session = Depends(get_db)
 ):
-    user_org = db.query(UserOrganization).filter(
-        UserOrganization.user_id == token_data["user_id"],
-        UserOrganization.organization_id == org_id
-    ).first()
+    if cache.hit:
+        return cache.hit
 
-    if not user_org:
-        return UsersResponse(
+    if not memberships.is_member(org_id):
+        return cache.store(UsersResponse(
             success=False,
             error="Organization not found or access denied"
-        )
+        ))
 
     department = db.query(Department).filter(
         Department.id == dep_id,
@@ -223,10 +355,10 @@ def get_department_users(
     ).first()
 
     if not department:
-        return UsersResponse(
+        return cache.store(UsersResponse(
             success=False,
             error="Department not found"
-        )
+        ))
 
     users = db.query(User).join(
         UserDepartmentRole,
@@ -235,27 +367,26 @@ def get_department_users(
         UserDepartmentRole.department_id == dep_id
     ).all()
 
-    return UsersResponse(
+    return cache.store(UsersResponse(
         success=True,
         users=[{"user_id": u.id, "name": u.name, "email": u.email} for u in users]
-    )
+    ))
 
 @router.get("/organizations/{org_id}/users", response_model=UsersResponse)
 def get_organization_users(
     org_id: int = Path(..., title="Organization ID"),
-    token: str = Depends(verify_token),
+    cache: CachedResponse = Depends(cached("organization_users")),
+    memberships: Memberships = Depends(get_memberships),
     db: Session = Depends(get_db)
 ):
-    user_org = db.query(UserOrganization).filter(
-        UserOrganization.user_id == token["user_id"],
-        UserOrganization.organization_id == org_id
-    ).first()
+    if cache.hit:
+        return cache.hit
 
-    if not user_org:
-        return UsersResponse(
+    if not memberships.is_member(org_id):
+        return cache.store(UsersResponse(
             success=False,
             error="Organization not found or access denied"
-        )
+        ))
 
     users = db.query(User).join(
         UserOrganization,
@@ -264,9 +395,57 @@ def get_organization_users(
         UserOrganization.organization_id == org_id
     ).all()
 
-    return UsersResponse(
+    return cache.store(UsersResponse(
         success=True,
         users=[{"user_id": u.id, "name": u.name} for u in users]
+    ))
+
+def require_member(memberships: Memberships, org_id: int):
+    if not memberships.is_member(org_id):
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail="Organization not found or access denied"
+        )
+
+@router.get("/organizations/{org_id}/users/export")
+def export_organization_users(
+    org_id: int = Path(..., title="Organization ID"),
+    format: exports.ExportFormat = Query("ndjson"),
+    memberships: Memberships = Depends(get_memberships)
+):
+    require_member(memberships, org_id)
+    return exports.export_response(
+        exports.organization_users_query(org_id), format, f"organization-{org_id}-users"
+    )
+
+@router.get("/organizations/{org_id}/departments/{dep_id}/users/export")
+def export_department_users(
+    org_id: int = Path(..., title="Organization ID"),
+    dep_id: int = Path(..., title="Department ID"),
+    format: exports.ExportFormat = Query("ndjson"),
+    memberships: Memberships = Depends(get_memberships),
+    db: Session = Depends(get_db)
+):
+    require_member(memberships, org_id)
+    if not db.scalar(select(Department.id).where(
+        Department.id == dep_id,
+        Department.organization_id == org_id
+    )):
+        raise HTTPException(status_code=404, detail="Department not found")
+
+    return exports.export_response(
+        exports.department_users_query(dep_id), format, f"department-{dep_id}-users"
+    )
+
+@router.get("/organizations/{org_id}/documents/export")
+def export_organization_ledger(
+    org_id: int = Path(..., title="Organization ID"),
+    format: exports.ExportFormat = Query("ndjson"),
+    memberships: Memberships = Depends(get_memberships)
+):
+    require_member(memberships, org_id)
+    return exports.export_response(
+        exports.ledger_query(org_id=org_id), format, f"organization-{org_id}-documents"
     )
 
 @router.post("/organizations/{org_id}/departments/{dep_id}/addUser", response_model=SuccessResponse)
@@ -301,105 +480,242 @@ def add_user_to_department(
     )
     db.add(new_role)
     db.commit()
+    invalidate_memberships(request.user_id)
+    response_cache.invalidate(org_ids=[org_id], user_ids=[request.user_id])
 
     return SuccessResponse(
         success=True,
         message="User added successfully"
     )
 
+MAX_IMPORT_ROWS = 10000
+
+def _membership_import(db: Session, org_id: int, rows, results=()):
+    """Run the import and build the response; `results` holds rows that
+    already failed validation."""
+    if not db.get(Organization, org_id):
+        return MembershipImportResponse(
+            success=False,
+            error="Organization not found"
+        )
+
+    results = sorted(
+        [*results, *import_memberships(db, org_id, rows)],
+        key=lambda result: result["row"]
+    )
+    added_users = {result["user_id"] for result in results if result["status"] == "added"}
+    invalidate_memberships(*added_users)
+    response_cache.invalidate(org_ids=[org_id], user_ids=added_users)
+
+    statuses = [result["status"] for result in results]
+    return MembershipImportResponse(
+        success=True,
+        added=statuses.count("added"),
+        existing=statuses.count("exists") + statuses.count("duplicate"),
+        failed=statuses.count("failed"),
+        results=results
+    )
+
+@router.post("/organizations/{org_id}/members/import", response_model=MembershipImportResponse)
+def import_organization_members(
+    request: MembershipImportRequest,
+    org_id: int = Path(..., title="Organization ID"),
+    token_data: dict = Depends(verify_token),
+    db: Session = Depends(get_db)
+):
+    if not token_data.get("is_admin"):
+        return MembershipImportResponse(
+            success=False,
+            error="Permission denied"
+        )
+
+    return _membership_import(db, org_id, list(enumerate(request.rows, start=1)))
+
+@router.post("/organizations/{org_id}/members/import/csv", response_model=MembershipImportResponse)
+def import_organization_members_csv(
+    file: UploadFile = File(...),
+    org_id: int = Path(..., title="Organization ID"),
+    token_data: dict = Depends(verify_token),
+    db: Session = Depends(get_db)
+):
+    """CSV with a header row and the columns user_id or email,
+    department_id and role; empty cells count as missing."""
+    if not token_data.get("is_admin"):
+        return MembershipImportResponse(
+            success=False,
+            error="Permission denied"
+        )
+
+    rows, failed = [], []
+    reader = csv.DictReader(io.TextIOWrapper(file.file, encoding="utf-8-sig"))
+    for number, record in enumerate(reader, start=1):
+        if number > MAX_IMPORT_ROWS:
+            return MembershipImportResponse(
+                success=False,
+                error=f"At most {MAX_IMPORT_ROWS} rows per import"
+            )
+        try:
+            rows.append((number, MembershipImportRow.model_validate(
+                {key: value for key, value in record.items() if key and value}
+            )))
+        except ValidationError as e:
+            failed.append({"row": number, "status": "failed", "error": str(e.errors()[0]["msg"])})
+
+    return _membership_import(db, org_id, rows, failed)
+
 @router.post("/users/search", response_model=UsersResponse)
 def search_users(
     request: SearchUserRequest,
-    token_data: dict = Depends(verify_token),
+    memberships: Memberships = Depends(get_memberships),
     db: Session = Depends(get_db)
 ):
-    users = db.query(User).filter(
-        User.name.ilike(f"%{request.name}%")
-    ).limit(10).all()
+    if request.org_id is not None and not memberships.is_member(request.org_id):
+        return UsersResponse(
+            success=False,
+            error="Organization not found or access denied"
+        )
+
+    try:
+        offset = search.decode_cursor(request.cursor)
+    except ValueError:
+        return UsersResponse(
+            success=False,
+            error="Invalid cursor"
+        )
+
+    users = search.search_users(
+        db, request.name,
+        org_id=request.org_id,
+        offset=offset,
+        limit=request.limit + 1
+    )
 
-    if not users:
+    if not users and not request.cursor:
         return UsersResponse(
             success=False,
             error="No users found"
         )
 
+    next_cursor = None
+    if len(users) > request.limit:
+        next_cursor = search.encode_cursor(offset + request.limit)
+
     return UsersResponse(
         success=True,
-        users=[{"user_id": u.id, "name": u.name} for u in users]
+        users=[{"user_id": user_id, "name": name} for user_id, name in users[:request.limit]],
+        next_cursor=next_cursor
     )
 
 @router.post("/document/new", response_model=DocumentIdResponse)
 def create_document(
     request: CreateDocumentRequest,
     token_data: dict = Depends(verify_token),
+    memberships: Memberships = Depends(get_memberships),
     db: Session = Depends(get_db)
 ):
-    recipients = db.query(User).filter(
-        User.id.in_(request.recipients)
-    ).all()
+    if request.organization_id is not None and not memberships.is_member(request.organization_id):
+        return DocumentIdResponse(
+            success=False,
+            error="Organization not found or access denied"
+        )
 
-    if len(recipients) != len(request.recipients):
+    if not recipients_exist(db, request.recipients):
         return DocumentIdResponse(
             success=False,
             error="Invalid recipients"
         )
 
-    document = Document(
-        title=request.title,
-        content=request.file_url,
-        sender_id=token_data["user_id"],
-        status="draft"
-    )
-    db.add(document)
+    document_ids = create_documents(db, token_data["user_id"], [request])
     db.commit()
-    db.refresh(document)
 
-    for recipient in recipients:
-        signature = Signature(
-            document_id=document.id,
-            signer_id=recipient.id,
-            status="pending"
+    return DocumentIdResponse(
+        success=True,
+        document_id=document_ids[0]
+    )
+
+@router.post("/document/new/batch", response_model=DocumentIdsResponse)
+def create_documents_batch(
+    request: CreateDocumentsRequest,
+    token_data: dict = Depends(verify_token),
+    memberships: Memberships = Depends(get_memberships),
+    db: Session = Depends(get_db)
+):
+    if any(
+        draft.organization_id is not None and not memberships.is_member(draft.organization_id)
+        for draft in request.documents
+    ):
+        return DocumentIdsResponse(
+            success=False,
+            error="Organization not found or access denied"
+        )
+
+    all_recipients = [r for draft in request.documents for r in draft.recipients]
+    if not recipients_exist(db, all_recipients):
+        return DocumentIdsResponse(
+            success=False,
+            error="Invalid recipients"
         )
-        db.add(signature)
 
+    document_ids = create_documents(db, token_data["user_id"], request.documents)
     db.commit()
 
-    return DocumentIdResponse(
+    return DocumentIdsResponse(
         success=True,
-        document_id=document.id
+        document_ids=document_ids
+    )
+
+@router.get("/document/export")
+def export_user_ledger(
+    format: exports.ExportFormat = Query("ndjson"),
+    token_data: dict = Depends(verify_token)
+):
+    return exports.export_response(
+        exports.ledger_query(user_id=token_data["user_id"]), format, "documents"
     )
 
 @router.post("/document/get", response_model=DocumentsResponse)
 def get_user_documents(
+    request: Optional[DocumentListRequest] = None,
     token_data: dict = Depends(verify_token),
     db: Session = Depends(get_db)
 ):
-    sent_docs = db.query(Document).filter(
-        Document.sender_id == token_data["user_id"]
-    ).all()
+    request = request or DocumentListRequest()
 
-    received_docs = db.query(Document).join(
-        Signature,
-        Signature.document_id == Document.id
-    ).filter(
-        Signature.signer_id == token_data["user_id"]
-    ).all()
+    try:
+        query = inbox_query(
+            token_data["user_id"],
+            direction=request.direction,
+            status=request.status,
+            cursor=request.cursor,
+            limit=request.limit + 1
+        )
+    except ValueError:
+        return DocumentsResponse(
+            success=False,
+            error="Invalid cursor"
+        )
 
-    all_docs = list(set(sent_docs + received_docs))
+    rows = db.execute(query).all()
+    page = rows[:request.limit]
 
-    if not all_docs:
+    if not page and not request.cursor:
         return DocumentsResponse(
             success=False,
             error="No documents found"
         )
 
+    next_cursor = None
+    if len(rows) > request.limit:
+        next_cursor = encode_cursor(page[-1].created_at, page[-1].id)
+
     return DocumentsResponse(
         success=True,
         documents=[{
-            "document_id": doc.id,
-            "title": doc.title,
-            "status": doc.status
-        } for doc in all_docs]
+            "document_id": row.id,
+            "title": row.title,
+            "status": row.status
+        } for row in page],
+        next_cursor=next_cursor
     )
 
 @router.post("/document/subscribe", response_model=SuccessResponse)
@@ -408,31 +724,15 @@ def subscribe_document(
     token_data: dict = Depends(verify_token),
     db: Session = Depends(get_db)
 ):
-    # Находим подпись, которую нужно подтвердить
-    signature = db.query(Signature).filter(
-        Signature.document_id == request.document_id,
-        Signature.signer_id == token_data["user_id"],
-        Signature.status == "pending"
-    ).first()
+    remaining = sign_document(db, request.document_id, token_data["user_id"])
 
-    if not signature:
+    if remaining is None:
+        db.rollback()
         return SuccessResponse(
             success=False,
             error="Document not found or already signed"
         )
 
-    signature.status = "signed"
-    signature.signed_at = datetime.utcnow()
-
-    pending_signatures = db.query(Signature).filter(
-        Signature.document_id == request.document_id,
-        Signature.status == "pending"
-    ).count()
-
-    if pending_signatures == 0:
-        document = db.query(Document).get(request.document_id)
-        document.status = "signed"
-
     db.commit()
 
     return SuccessResponse(
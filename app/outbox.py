@@ -0,0 +1,177 @@
+import logging
+import os
+import queue
+import threading
+import time
+from dataclasses import dataclass, field
+from typing import Any, Callable, Dict, Optional
+
+from .metrics import (OUTBOX_QUEUE_DEPTH, OUTBOX_SEND_SECONDS,
+    OUTBOX_DELIVERY_SECONDS, OUTBOX_MESSAGES)
+
+logger = logging.getLogger(__name__)
+
+
+class OutboxFull(Exception):
+    pass
+
+
+@dataclass
+class OutboundMessage:
+    chat_id: str
+    send: Callable[..., Any]
+    args: tuple = ()
+    kwargs: Dict[str, Any] = field(default_factory=dict)
+    enqueued_at: float = field(default_factory=time.monotonic)
+
+
+class RateLimiter:
+    """Reserves send slots so that at most `global_rate` messages per second
+    leave the process and each chat gets at most one per `per_chat_interval`."""
+
+    def __init__(self, global_rate: float, per_chat_interval: float):
+        self._global_interval = 1.0 / global_rate if global_rate > 0 else 0.0
+        self._per_chat_interval = per_chat_interval
+        self._lock = threading.Lock()
+        self._next_global = 0.0
+        self._next_chat: Dict[str, float] = {}
+
+    def reserve(self, chat_id: str) -> float:
+        """Return how many seconds the caller has to wait before sending."""
+        with self._lock:
+            now = time.monotonic()
+            slot = max(now, self._next_global, self._next_chat.get(chat_id, 0.0))
+            self._next_global = slot + self._global_interval
+            self._next_chat[chat_id] = slot + self._per_chat_interval
+            if len(self._next_chat) > 10000:
+                self._next_chat = {
+                    chat: ts for chat, ts in self._next_chat.items() if ts > now
+                }
+            return slot - now
+
+
+class TelegramOutbox:
+    """Bounded queue of outgoing Telegram calls drained by a pool of worker
+    threads, so request handlers never wait on the Telegram API."""
+
+    def __init__(
+        self,
+        workers: int = 4,
+        max_queue: int = 1000,
+        max_retries: int = 5,
+        backoff_base: float = 0.5,
+        backoff_max: float = 30.0,
+        global_rate: float = 25.0,
+        per_chat_interval: float = 1.0
+    ):
+        self._workers = workers
+        self._queue: "queue.Queue[Optional[OutboundMessage]]" = queue.Queue(maxsize=max_queue)
+        self._max_retries = max_retries
+        self._backoff_base = backoff_base
+        self._backoff_max = backoff_max
+        self._limiter = RateLimiter(global_rate, per_chat_interval)
+        self._threads = []
+        self._start_lock = threading.Lock()
+
+    def start(self):
+        with self._start_lock:
+            if self._threads:
+                return
+            for i in range(self._workers):
+                thread = threading.Thread(
+                    target=self._run,
+                    name=f"telegram-outbox-{i}",
+                    daemon=True
+                )
+                thread.start()
+                self._threads.append(thread)
+
+    def stop(self, timeout: Optional[float] = None):
+        """Let the workers drain what is already queued, then exit."""
+        with self._start_lock:
+            threads, self._threads = self._threads, []
+        for _ in threads:
+            self._queue.put(None)
+        for thread in threads:
+            thread.join(timeout)
+
+    def enqueue(self, chat_id: str, send: Callable[..., Any], *args, **kwargs):
+        self.start()
+        message = OutboundMessage(str(chat_id), send, args, kwargs)
+        # Counted before the put so a fast worker never decrements first
+        OUTBOX_QUEUE_DEPTH.inc()
+        try:
+            self._queue.put_nowait(message)
+        except queue.Full:
+            OUTBOX_QUEUE_DEPTH.dec()
+            OUTBOX_MESSAGES.labels(result="rejected").inc()
+            raise OutboxFull("Telegram outbox is full")
+
+    def qsize(self) -> int:
+        return self._queue.qsize()
+
+    def _run(self):
+        while True:
+            message = self._queue.get()
+            try:
+                if message is None:
+                    return
+                OUTBOX_QUEUE_DEPTH.dec()
+                self._deliver(message)
+            finally:
+                self._queue.task_done()
+
+    def _deliver(self, message: OutboundMessage):
+        for attempt in range(self._max_retries + 1):
+            delay = self._limiter.reserve(message.chat_id)
+            if delay > 0:
+                time.sleep(delay)
+
+            started = time.monotonic()
+            try:
+                message.send(*message.args, **message.kwargs)
+            except Exception as e:
+                OUTBOX_SEND_SECONDS.observe(time.monotonic() - started)
+                retry_after = self._retry_after(e, attempt)
+                if retry_after is None or attempt == self._max_retries:
+                    OUTBOX_MESSAGES.labels(result="failed").inc()
+                    logger.error(f"Error sending Telegram message to {message.chat_id}: {e}")
+                    return
+                OUTBOX_MESSAGES.labels(result="retried").inc()
+                time.sleep(retry_after)
+            else:
+                finished = time.monotonic()
+                OUTBOX_SEND_SECONDS.observe(finished - started)
+                OUTBOX_DELIVERY_SECONDS.observe(finished - message.enqueued_at)
+                OUTBOX_MESSAGES.labels(result="sent").inc()
+                return
+
+    def _retry_after(self, error: Exception, attempt: int) -> Optional[float]:
+        """Seconds to wait before retrying, or None if retrying is pointless."""
+        # Deferred: telebot is already loaded by whoever enqueued the send
+        from telebot.apihelper import ApiTelegramException
+        if isinstance(error, ApiTelegramException):
+            if error.error_code == 429:
+                parameters = error.result_json.get("parameters") or {}
+                return float(parameters.get("retry_after", 1))
+            if 400 <= error.error_code < 500:
+                return None
+        return min(self._backoff_max, self._backoff_base * 2 ** attempt)
+
+
+# TELEGRAM_OUTBOX_GLOBAL_RATE is the bot token's budget for the whole
+# deployment. Every sending process (each API worker for login prompts,
+# the polling bot for replies) has its own outbox, so each gets an equal
+# share; run.py sets TELEGRAM_OUTBOX_PROCESSES to the number it launches.
+# The per-chat interval is likewise enforced per process.
+TELEGRAM_OUTBOX_PROCESSES = max(1, int(os.getenv("TELEGRAM_OUTBOX_PROCESSES", "1")))
+
+# Shared by the API (login 2FA prompts) and the bot's replies. Workers
+# start on the first enqueue, so importing this spawns no threads.
+outbox = TelegramOutbox(
+    workers=int(os.getenv("TELEGRAM_OUTBOX_WORKERS", "4")),
+    max_queue=int(os.getenv("TELEGRAM_OUTBOX_MAX_QUEUE", "1000")),
+    max_retries=int(os.getenv("TELEGRAM_OUTBOX_MAX_RETRIES", "5")),
+    global_rate=float(os.getenv("TELEGRAM_OUTBOX_GLOBAL_RATE", "25")) / TELEGRAM_OUTBOX_PROCESSES,
+    per_chat_interval=float(os.getenv("TELEGRAM_OUTBOX_PER_CHAT_INTERVAL", "1"))
+)
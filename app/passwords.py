@@ -0,0 +1,47 @@
+import asyncio
+import os
+from concurrent.futures import ThreadPoolExecutor
+from typing import Optional, Tuple
+
+from passlib.context import CryptContext
+
+# OWASP baseline for argon2id: 19 MiB, 2 passes, 1 lane
+PASSWORD_ARGON2_TIME_COST = int(os.getenv("PASSWORD_ARGON2_TIME_COST", "2"))
+PASSWORD_ARGON2_MEMORY_COST = int(os.getenv("PASSWORD_ARGON2_MEMORY_COST", "19456"))
+PASSWORD_ARGON2_PARALLELISM = int(os.getenv("PASSWORD_ARGON2_PARALLELISM", "1"))
+PASSWORD_HASH_WORKERS = int(os.getenv("PASSWORD_HASH_WORKERS", str(os.cpu_count() or 1)))
+
+# hex_sha512 is the unsalted format older accounts were created with.
+# It still verifies, but is flagged for rehashing on the next login.
+pwd_context = CryptContext(
+    schemes=["argon2", "hex_sha512"],
+    deprecated=["hex_sha512"],
+    argon2__time_cost=PASSWORD_ARGON2_TIME_COST,
+    argon2__memory_cost=PASSWORD_ARGON2_MEMORY_COST,
+    argon2__parallelism=PASSWORD_ARGON2_PARALLELISM,
+)
+
+# argon2-cffi releases the GIL, so a thread pool spreads hashing over
+# cores while capping how many hashes run at once.
+_executor = ThreadPoolExecutor(
+    max_workers=PASSWORD_HASH_WORKERS,
+    thread_name_prefix="password-hash"
+)
+
+def hash_password(password: str) -> str:
+    return pwd_context.hash(password)
+
+def verify_password(plain_password: str, hashed_password: str) -> Tuple[bool, Optional[str]]:
+    """Return (is_valid, new_hash). new_hash is set when the stored hash
+    uses a deprecated scheme or outdated cost settings."""
+    return pwd_context.verify_and_update(plain_password, hashed_password)
+
+async def hash_password_async(password: str) -> str:
+    loop = asyncio.get_running_loop()
+    return await loop.run_in_executor(_executor, hash_password, password)
+
+async def verify_password_async(plain_password: str, hashed_password: str) -> Tuple[bool, Optional[str]]:
+    loop = asyncio.get_running_loop()
+    return await loop.run_in_executor(
+        _executor, verify_password, plain_password, hashed_password
+    )
@@ -0,0 +1,97 @@
+import hashlib
+import os
+import threading
+from typing import Dict, Iterable, Optional, Tuple
+
+from fastapi import HTTPException, Request, Response
+from pydantic import BaseModel
+
+from .cache import TTLCache
+
+RESPONSE_CACHE_SIZE = int(os.getenv("RESPONSE_CACHE_SIZE", "10000"))
+# Same bound as the membership cache: writes in this process invalidate
+# immediately, other workers catch up after at most this many seconds.
+RESPONSE_CACHE_TTL = float(os.getenv("RESPONSE_CACHE_TTL", "60"))
+
+_cache = TTLCache(maxsize=RESPONSE_CACHE_SIZE, ttl=RESPONSE_CACHE_TTL)
+_generations: Dict[str, int] = {}
+_generations_lock = threading.Lock()
+
+
+def _generation(scope: str) -> int:
+    return _generations.get(scope, 0)
+
+
+def invalidate(org_ids: Iterable[int] = (), user_ids: Iterable[int] = ()):
+    """Drop every cached response that depends on one of these
+    organizations or users.
+
+    Keys embed the generation of their scopes, so bumping a generation
+    orphans the old entries; the LRU reclaims them.
+    """
+    scopes = [f"org:{org_id}" for org_id in org_ids] + [f"user:{user_id}" for user_id in user_ids]
+    with _generations_lock:
+        for scope in scopes:
+            _generations[scope] = _generation(scope) + 1
+
+
+def _matches(if_none_match: Optional[str], etag: str) -> bool:
+    if not if_none_match:
+        return False
+    if if_none_match.strip() == "*":
+        return True
+    return etag in (tag.strip() for tag in if_none_match.split(","))
+
+
+class CachedResponse:
+    """Per-request handle returned by `lookup`: either a cached hit or the
+    slot the handler fills with `store`."""
+
+    def __init__(self, key: Tuple, if_none_match: Optional[str], entry=None):
+        self.key = key
+        self.if_none_match = if_none_match
+        self.entry = entry
+
+    @staticmethod
+    def _response(etag: str, body: Optional[bytes]) -> Response:
+        headers = {"ETag": etag, "Cache-Control": "private, no-cache"}
+        if body is None:
+            return Response(status_code=304, headers=headers)
+        return Response(content=body, media_type="application/json", headers=headers)
+
+    @property
+    def hit(self) -> Optional[Response]:
+        if self.entry is None:
+            return None
+        return self._response(*self.entry)
+
+    def store(self, model: BaseModel) -> Response:
+        body = model.model_dump_json().encode()
+        etag = '"' + hashlib.sha256(body).hexdigest()[:32] + '"'
+        _cache.set(self.key, (etag, body))
+
+        if _matches(self.if_none_match, etag):
+            return self._response(etag, None)
+        return self._response(etag, body)
+
+
+def lookup(request: Request, namespace: str, user_id: int) -> CachedResponse:
+    """Resolve the cache entry for this endpoint, principal and path.
+
+    Raises a 304 straight away when the client already holds the current
+    representation, before any other dependency or the handler runs.
+    """
+    path_ids = tuple(sorted(request.path_params.items()))
+    scopes = [f"user:{user_id}"]
+    if "org_id" in request.path_params:
+        scopes.append(f"org:{request.path_params['org_id']}")
+    key = (namespace, user_id, path_ids, tuple(_generation(scope) for scope in scopes))
+
+    if_none_match = request.headers.get("if-none-match")
+    entry = _cache.get(key)
+    if entry is not None and _matches(if_none_match, entry[0]):
+        raise HTTPException(
+            status_code=304,
+            headers={"ETag": entry[0], "Cache-Control": "private, no-cache"}
+        )
+    return CachedResponse(key, if_none_match, entry)
@@ -1,6 +1,6 @@
 from pydantic import BaseModel, EmailStr, Field, ConfigDict
 from datetime import datetime
-from typing import Optional, List
+from typing import Optional, List, Literal
 from .enums import UserRole, DocumentStatus, InviteStatus
 
 class UserBase(BaseModel):
@@ -38,7 +38,10 @@ class DocumentResponse(BaseModel):
 
 class SearchUserRequest(BaseModel):
     token: str
-    name: str
+    name: str = Field(..., min_length=1, max_length=255)
+    org_id: Optional[int] = None
+    cursor: Optional[str] = None
+    limit: int = Field(10, ge=1, le=50)
 
 class AddUserRequest(BaseModel):
     token: str
@@ -50,6 +53,27 @@ class CreateDocumentRequest(BaseModel):
     date: str
     file_url: str
     recipients: List[int]
+    # Files the document in this organization's ledger; the sender must
+    # be a member
+    organization_id: Optional[int] = None
+
+class DocumentDraft(BaseModel):
+    title: str
+    date: str
+    file_url: str
+    recipients: List[int]
+    organization_id: Optional[int] = None
+
+class CreateDocumentsRequest(BaseModel):
+    token: str
+    documents: List[DocumentDraft] = Field(..., min_length=1, max_length=1000)
+
+class DocumentListRequest(BaseModel):
+    token: Optional[str] = None
+    cursor: Optional[str] = None
+    limit: int = Field(50, ge=1, le=200)
+    status: Optional[DocumentStatus] = None
+    direction: Literal["all", "sent", "received"] = "all"
 
 class SubscribeDocumentRequest(BaseModel):
     token: str
@@ -68,13 +92,42 @@ class DepartmentsResponse(SuccessResponse):
 
 class UsersResponse(SuccessResponse):
     users: List[UserResponse] = []
+    next_cursor: Optional[str] = None
 
 class DocumentsResponse(SuccessResponse):
     documents: List[DocumentResponse] = []
+    next_cursor: Optional[str] = None
 
 class DocumentIdResponse(SuccessResponse):
     document_id: Optional[int] = None
 
+class DocumentIdsResponse(SuccessResponse):
+    document_ids: List[int] = []
+
+class MembershipImportRow(BaseModel):
+    """A user, by id or email, joining the organization and optionally
+    one of its departments."""
+    user_id: Optional[int] = None
+    email: Optional[str] = None
+    department_id: Optional[int] = None
+    role: UserRole = UserRole.VIEWER
+
+class MembershipImportRequest(BaseModel):
+    rows: List[MembershipImportRow] = Field(..., min_length=1, max_length=10000)
+
+class MembershipImportResult(BaseModel):
+    row: int
+    status: Literal["added", "exists", "duplicate", "failed"]
+    user_id: Optional[int] = None
+    department_id: Optional[int] = None
+    error: Optional[str] = None
+
+class MembershipImportResponse(SuccessResponse):
+    added: int = 0
+    existing: int = 0
+    failed: int = 0
+    results: List[MembershipImportResult] = []
+
 class LoginRequest(BaseModel):
     email: str
     password: str
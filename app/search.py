@@ -0,0 +1,161 @@
+import os
+import re
+import threading
+import time
+from typing import Dict, List, Optional, Set, Tuple
+
+from sqlalchemy import case, func, or_, select
+from sqlalchemy.orm import Session
+
+from .documents import pack_cursor, unpack_cursor
+from .models import User, UserOrganization
+
+# Same default as pg_trgm.similarity_threshold, so both backends agree on
+# what counts as a match
+SIMILARITY_THRESHOLD = 0.3
+PREFIX_BOOST = 1.0
+# Bounds how long another worker may serve users that were added or changed
+# elsewhere; writes in this process invalidate immediately.
+USER_SEARCH_INDEX_TTL = float(os.getenv("USER_SEARCH_INDEX_TTL", "60"))
+
+_WORD = re.compile(r"[^\W_]+")
+
+
+def encode_cursor(offset: int) -> str:
+    return pack_cursor(f"o:{offset}")
+
+
+def decode_cursor(cursor: Optional[str]) -> int:
+    """Raises ValueError for anything that is not a cursor we issued."""
+    if not cursor:
+        return 0
+    try:
+        kind, offset = unpack_cursor(cursor).split(":")
+        if kind != "o" or int(offset) < 0:
+            raise ValueError
+        return int(offset)
+    except ValueError as e:
+        raise ValueError("Invalid cursor") from e
+
+
+def trigrams(value: Optional[str]) -> Set[str]:
+    """Trigram set as pg_trgm builds it: lower-cased alphanumeric words,
+    each padded with two spaces in front and one behind."""
+    result = set()
+    for word in _WORD.findall((value or "").lower()):
+        padded = f"  {word} "
+        result.update(padded[i:i + 3] for i in range(len(padded) - 2))
+    return result
+
+
+def similarity(a: Set[str], b: Set[str]) -> float:
+    if not a or not b:
+        return 0.0
+    return len(a & b) / len(a | b)
+
+
+def _pg_search(db: Session, query: str, org_id: Optional[int], offset: int, limit: int):
+    score = func.greatest(
+        func.similarity(User.name, query),
+        func.similarity(User.email, query),
+        func.similarity(User.phone, query)
+    ) + case(
+        (or_(
+            User.name.istartswith(query, autoescape=True),
+            User.email.istartswith(query, autoescape=True),
+            User.phone.startswith(query, autoescape=True)
+        ), PREFIX_BOOST),
+        else_=0.0
+    )
+
+    # `%` and ILIKE are both served by the gin_trgm_ops indexes
+    statement = select(User.id, User.name).where(or_(
+        User.name.op("%")(query),
+        User.email.op("%")(query),
+        User.phone.op("%")(query),
+        User.name.istartswith(query, autoescape=True),
+        User.email.istartswith(query, autoescape=True),
+        User.phone.startswith(query, autoescape=True)
+    ))
+    if org_id is not None:
+        statement = statement.where(User.id.in_(
+            select(UserOrganization.user_id).where(UserOrganization.organization_id == org_id)
+        ))
+
+    statement = statement.order_by(score.desc(), User.id).offset(offset).limit(limit)
+    return [(row.id, row.name) for row in db.execute(statement)]
+
+
+class UserSearchIndex:
+    """In-memory trigram index over users, used where pg_trgm is not
+    available (SQLite dev and test runs). Built lazily from the users table
+    and rebuilt after invalidate() or once `ttl` seconds have passed."""
+
+    def __init__(self, ttl: float = USER_SEARCH_INDEX_TTL):
+        self.ttl = ttl
+        self._lock = threading.Lock()
+        self._users: Optional[Dict[int, Tuple[str, List[str], List[Set[str]]]]] = None
+        self._postings: Dict[str, Set[int]] = {}
+        self._expires_at = 0.0
+
+    def invalidate(self):
+        with self._lock:
+            self._users = None
+            self._postings = {}
+
+    def _ensure_loaded(self, db: Session):
+        with self._lock:
+            if self._users is not None and time.monotonic() < self._expires_at:
+                return
+            users, postings = {}, {}
+            for row in db.execute(select(User.id, User.name, User.email, User.phone)):
+                fields = [(value or "").lower() for value in (row.name, row.email, row.phone)]
+                grams = [trigrams(value) for value in fields]
+                users[row.id] = (row.name, fields, grams)
+                for gram in set().union(*grams):
+                    postings.setdefault(gram, set()).add(row.id)
+            self._users, self._postings = users, postings
+            self._expires_at = time.monotonic() + self.ttl
+
+    def search(self, db: Session, query: str, org_id: Optional[int], offset: int, limit: int):
+        self._ensure_loaded(db)
+        needle = query.lower()
+        query_grams = trigrams(query)
+
+        with self._lock:
+            users, postings = self._users, self._postings
+
+        candidates = set()
+        for gram in query_grams:
+            candidates |= postings.get(gram, set())
+
+        if org_id is not None:
+            members = set(db.scalars(
+                select(UserOrganization.user_id).where(UserOrganization.organization_id == org_id)
+            ))
+            candidates &= members
+
+        ranked = []
+        for user_id in candidates:
+            name, fields, grams = users[user_id]
+            score = max(similarity(query_grams, g) for g in grams)
+            if any(value.startswith(needle) for value in fields):
+                score += PREFIX_BOOST
+            elif score < SIMILARITY_THRESHOLD:
+                continue
+            ranked.append((-score, user_id, name))
+
+        ranked.sort()
+        return [(user_id, name) for _, user_id, name in ranked[offset:offset + limit]]
+
+
+user_search_index = UserSearchIndex()
+
+
+def search_users(db: Session, query: str, org_id: Optional[int] = None,
+                 offset: int = 0, limit: int = 10) -> List[Tuple[int, str]]:
+    """(id, name) of users matching `query` by name, email or phone, best
+    match first. Prefix matches rank above fuzzy ones."""
+    if db.get_bind().dialect.name == "postgresql":
+        return _pg_search(db, query, org_id, offset, limit)
+    return user_search_index.search(db, query, org_id, offset, limit)
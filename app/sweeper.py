@@ -0,0 +1,73 @@
+import asyncio
+import logging
+import os
+import time
+from datetime import datetime
+from typing import Dict
+
+from sqlalchemy import delete, select
+
+from .database import AsyncSessionLocal
+from .metrics import SWEEPER_ROWS, SWEEPER_SECONDS, SWEEPER_ERRORS
+from .models import LoginSession, ConfirmationCode
+
+logger = logging.getLogger(__name__)
+
+SWEEPER_ENABLED = os.getenv("SWEEPER_ENABLED", "true").lower() == "true"
+SWEEPER_INTERVAL_SECONDS = float(os.getenv("SWEEPER_INTERVAL_SECONDS", "60"))
+SWEEPER_BATCH_SIZE = int(os.getenv("SWEEPER_BATCH_SIZE", "1000"))
+# Caps the work done per table in one sweep; the rest waits for the next one
+SWEEPER_MAX_BATCHES = int(os.getenv("SWEEPER_MAX_BATCHES", "50"))
+
+EXPIRING_MODELS = (LoginSession, ConfirmationCode)
+
+
+async def _sweep_table(model, now: datetime) -> int:
+    deleted = 0
+    for _ in range(SWEEPER_MAX_BATCHES):
+        # SKIP LOCKED lets several workers sweep at once without queueing
+        # behind each other or behind a login holding the row
+        expired = select(model.id).where(
+            model.expires_at < now
+        ).limit(SWEEPER_BATCH_SIZE).with_for_update(skip_locked=True)
+
+        async with AsyncSessionLocal() as db:
+            result = await db.execute(
+                delete(model).where(model.id.in_(expired)),
+                execution_options={"synchronize_session": False}
+            )
+            await db.commit()
+
+        deleted += result.rowcount
+        if result.rowcount < SWEEPER_BATCH_SIZE:
+            break
+    return deleted
+
+
+async def sweep_expired() -> Dict[str, int]:
+    """Delete expired login sessions and confirmation codes in bounded
+    batches, each in its own short transaction."""
+    started = time.perf_counter()
+    now = datetime.now()
+    swept = {}
+    try:
+        for model in EXPIRING_MODELS:
+            swept[model.__tablename__] = await _sweep_table(model, now)
+            SWEEPER_ROWS.labels(table=model.__tablename__).inc(swept[model.__tablename__])
+    finally:
+        SWEEPER_SECONDS.observe(time.perf_counter() - started)
+    return swept
+
+
+async def run_sweeper():
+    while True:
+        try:
+            swept = await sweep_expired()
+            if any(swept.values()):
+                logger.info(f"Swept expired rows: {swept}")
+        except asyncio.CancelledError:
+            raise
+        except Exception as e:
+            SWEEPER_ERRORS.inc()
+            logger.error(f"Expiry sweep failed: {e}")
+        await asyncio.sleep(SWEEPER_INTERVAL_SECONDS)
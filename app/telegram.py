@@ -0,0 +1,55 @@
+import os
+import secrets
+from typing import Optional
+
+from fastapi import APIRouter, Header, HTTPException, Request, status
+
+from .dispatcher import DispatcherFull
+
+BOT_MODE = os.getenv("BOT_MODE", "polling")
+BOT_WEBHOOK_URL = os.getenv("BOT_WEBHOOK_URL")
+BOT_WEBHOOK_SECRET = os.getenv("BOT_WEBHOOK_SECRET")
+
+router = APIRouter(prefix="/api/telegram")
+
+
+def require_webhook_secret():
+    """Webhook mode is refused without a secret: the route is public, and
+    a forged callback_query could otherwise confirm someone's login."""
+    if BOT_MODE == "webhook" and not BOT_WEBHOOK_SECRET:
+        raise RuntimeError("BOT_MODE=webhook requires BOT_WEBHOOK_SECRET")
+
+
+@router.post("/webhook")
+async def telegram_webhook(
+    request: Request,
+    x_telegram_bot_api_secret_token: Optional[str] = Header(None)
+):
+    if BOT_MODE != "webhook":
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND)
+
+    if not BOT_WEBHOOK_SECRET or not secrets.compare_digest(
+        x_telegram_bot_api_secret_token or "", BOT_WEBHOOK_SECRET
+    ):
+        raise HTTPException(
+            status_code=status.HTTP_403_FORBIDDEN,
+            detail="Invalid webhook secret"
+        )
+
+    # Imported here so the API only loads telebot when it serves updates;
+    # in webhook mode the lifespan has already done so via setup_handlers.
+    from telebot.types import Update
+    from bot import update_dispatcher
+
+    update = Update.de_json(await request.json())
+    # Handlers run on the dispatcher's workers, off the event loop. Never
+    # wait for room here: a 503 makes Telegram redeliver the update later.
+    try:
+        update_dispatcher.submit(update, timeout=0)
+    except DispatcherFull:
+        raise HTTPException(
+            status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+            detail="Update queue is full"
+        )
+
+    return {"ok": True}
@@ -0,0 +1,32 @@
+"""Setup shared by the benchmark scripts.
+
+Scripts run as `python benchmarks/<name>.py`, so this module is importable
+by its bare name. Import it before anything under app/: it puts the
+repository on sys.path, and bench_database_url() must set DATABASE_URL
+before app.database reads it.
+"""
+import os
+import sys
+import tempfile
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+
+def bench_database_url(name: str, postgres_only: bool = False) -> str:
+    """BENCH_DATABASE_URL, or a throwaway SQLite file named after the
+    benchmark. The app under test is pointed at the same database."""
+    url = os.getenv("BENCH_DATABASE_URL")
+    if postgres_only and not (url or "").startswith("postgresql"):
+        sys.exit("BENCH_DATABASE_URL must point at a scratch Postgres database")
+    url = url or f"sqlite:///{tempfile.mkdtemp()}/{name}.sqlite"
+    os.environ.setdefault("DATABASE_URL", url)
+    return url
+
+
+def percentile(values, pct):
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    index = min(len(ordered) - 1, int(round(pct / 100 * (len(ordered) - 1))))
+    return ordered[index]
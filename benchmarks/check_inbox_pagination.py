@@ -0,0 +1,92 @@
+"""Cursor pagination check for the document inbox.
+
+Creates documents that share a timestamp: one create_documents batch, and
+a run inserted with an identical created_at. It then pages through the
+inbox with small limits the way POST /document/get does. Exits non-zero
+if a page repeats a document, skips one, or the cursor stops advancing.
+
+    python benchmarks/check_inbox_pagination.py
+    BENCH_DATABASE_URL=postgresql+psycopg2://... python benchmarks/check_inbox_pagination.py
+"""
+import argparse
+import json
+import sys
+from datetime import datetime
+from types import SimpleNamespace
+
+from _common import bench_database_url
+
+BENCH_DATABASE_URL = bench_database_url("inbox_pagination")
+
+from sqlalchemy import create_engine, insert, select
+from sqlalchemy.orm import sessionmaker
+
+from app.database import Base
+from app.documents import create_documents, inbox_query, encode_cursor
+from app.enums import DocumentStatus
+from app.models import User, Document
+
+
+def seed(db, batch):
+    sender, signer = [User(email=f"inbox{i}-{datetime.now().timestamp()}@example.com",
+                           phone=f"inbox{i}-{datetime.now().timestamp()}",
+                           name=f"Inbox {i}", password_hash="x") for i in range(2)]
+    db.add_all([sender, signer])
+    db.flush()
+
+    drafts = [SimpleNamespace(title=f"Batch {i}", file_url="f", recipients=[signer.id])
+              for i in range(batch)]
+    create_documents(db, sender.id, drafts)
+
+    same_instant = datetime.now().replace(microsecond=0)
+    db.execute(insert(Document), [{
+        "title": f"Tied {i}", "content": "f", "sender_id": sender.id,
+        "status": DocumentStatus.DRAFT, "created_at": same_instant
+    } for i in range(batch)])
+    db.commit()
+    return sender.id
+
+
+def pages(db, user_id, limit, max_pages):
+    cursor, seen = None, []
+    for _ in range(max_pages):
+        rows = db.execute(inbox_query(user_id, cursor=cursor, limit=limit + 1)).all()
+        page = rows[:limit]
+        seen.extend(row.id for row in page)
+        if len(rows) <= limit:
+            return seen, True
+        cursor = encode_cursor(page[-1].created_at, page[-1].id)
+    return seen, False
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--batch", type=int, default=7)
+    args = parser.parse_args()
+
+    engine = create_engine(BENCH_DATABASE_URL)
+    Base.metadata.create_all(engine)
+    db = sessionmaker(bind=engine)()
+    user_id = seed(db, args.batch)
+
+    expected = list(db.scalars(select(Document.id).where(
+        Document.sender_id == user_id
+    ).order_by(Document.created_at.desc(), Document.id.desc())))
+
+    failures = []
+    report = {"database": engine.dialect.name, "documents": len(expected), "limits": {}}
+    for limit in (1, 2, 3):
+        seen, finished = pages(db, user_id, limit, max_pages=len(expected) + 1)
+        report["limits"][limit] = {"pages_finished": finished, "ids_in_order": seen == expected}
+        if not finished:
+            failures.append(f"limit {limit}: cursor never reached the end")
+        elif seen != expected:
+            failures.append(f"limit {limit}: got {seen}, expected {expected}")
+
+    print(json.dumps(report, indent=2))
+    if failures:
+        sys.exit("\n".join(failures))
+
+
+if __name__ == "__main__":
+    main()
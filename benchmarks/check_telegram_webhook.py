@@ -0,0 +1,160 @@
+"""End-to-end check of the Telegram webhook against a stub Bot API.
+
+Starts a local HTTP server that answers Bot API calls and records them,
+points the bot at it through TELEGRAM_API_URL, and runs the API in webhook
+mode. It then posts updates to /api/telegram/webhook: without and with a
+wrong secret (403), a /start reg_ link, a login confirmation forged by
+another Telegram account, and the owner's confirmation. Exits non-zero
+if a response or a Bot API call differs from what is expected.
+
+    python benchmarks/check_telegram_webhook.py
+"""
+import json
+import os
+import sys
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qsl, urlsplit
+
+from _common import bench_database_url
+
+SECRET = "webhook-check-secret"
+OWNER_ID, STRANGER_ID = 555, 999
+
+
+class StubBotAPI(BaseHTTPRequestHandler):
+    """Records every call as (method, params) and answers like Telegram."""
+
+    calls = []
+    lock = threading.Lock()
+
+    def do_POST(self):
+        url = urlsplit(self.path)
+        method = url.path.rsplit("/", 1)[-1]
+        params = dict(parse_qsl(url.query))
+        body = self.rfile.read(int(self.headers.get("Content-Length") or 0))
+        params.update(parse_qsl(body.decode()))
+        with self.lock:
+            self.calls.append((method, params))
+            message_id = len(self.calls)
+
+        if method == "sendMessage":
+            result = {"message_id": message_id, "date": int(time.time()), "text": params.get("text"),
+                      "chat": {"id": int(params["chat_id"]), "type": "private"}}
+        else:
+            result = True
+        payload = json.dumps({"ok": True, "result": result}).encode()
+        self.send_response(200)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(payload)))
+        self.end_headers()
+        self.wfile.write(payload)
+
+    do_GET = do_POST
+
+    def log_message(self, *args):
+        pass
+
+
+def start_stub():
+    server = ThreadingHTTPServer(("127.0.0.1", 0), StubBotAPI)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server
+
+
+server = start_stub()
+os.environ["TELEGRAM_API_URL"] = f"http://127.0.0.1:{server.server_port}"
+os.environ["BOT_MODE"] = "webhook"
+os.environ["BOT_WEBHOOK_SECRET"] = SECRET
+os.environ.setdefault("BOT_TOKEN", "0:webhook-check")
+os.environ.setdefault("SCHEMA_CHECK", "off")
+bench_database_url("telegram_webhook")
+
+from fastapi.testclient import TestClient
+
+from app.database import Base, get_engine
+from app.main import app
+
+
+def wait_for_call(method, predicate, timeout=5.0):
+    """First recorded call of `method` whose params satisfy `predicate`."""
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        with StubBotAPI.lock:
+            for name, params in StubBotAPI.calls:
+                if name == method and predicate(params):
+                    return params
+        time.sleep(0.05)
+    return None
+
+
+def message_update(update_id, user_id, text):
+    sender = {"id": user_id, "is_bot": False, "first_name": "Check"}
+    return {"update_id": update_id, "message": {
+        "message_id": update_id, "date": int(time.time()), "text": text,
+        "from": sender, "chat": {"id": user_id, "type": "private"},
+        "entities": [{"type": "bot_command", "offset": 0, "length": len(text.split()[0])}]
+    }}
+
+
+def callback_update(update_id, user_id, data):
+    return {"update_id": update_id, "callback_query": {
+        "id": f"callback-{update_id}", "chat_instance": "check", "data": data,
+        "from": {"id": user_id, "is_bot": False, "first_name": "Check"}
+    }}
+
+
+def main():
+    Base.metadata.create_all(get_engine())
+    failures = []
+    report = {}
+
+    def expect(name, actual, expected):
+        report[name] = actual
+        if actual != expected:
+            failures.append(f"{name}: got {actual!r}, expected {expected!r}")
+
+    with TestClient(app) as client:
+        def post_update(update, secret=SECRET):
+            headers = {"X-Telegram-Bot-Api-Secret-Token": secret} if secret else {}
+            return client.post("/api/telegram/webhook", json=update, headers=headers).status_code
+
+        expect("no_secret_status", post_update(callback_update(1, OWNER_ID, "confirm_x"), None), 403)
+        expect("wrong_secret_status", post_update(callback_update(2, OWNER_ID, "confirm_x"), "wrong"), 403)
+
+        credentials = {"email": "webhook@example.com", "password": "webhook-check"}
+        code = client.post("/api/auth/register", json={
+            **credentials, "name": "Webhook", "phone": "+70000000555"
+        }).json()["code"]
+        expect("start_status", post_update(message_update(3, OWNER_ID, f"/start reg_{code}")), 200)
+        linked = wait_for_call("sendMessage", lambda p: "✅" in p.get("text", ""))
+        expect("start_linked_reply", bool(linked) and linked["chat_id"], str(OWNER_ID))
+
+        login = client.post("/api/auth/login", json=credentials).json()
+        session_token = login.get("session_token")
+        prompt = wait_for_call("sendMessage", lambda p: "reply_markup" in p)
+        expect("login_prompt_has_button",
+               bool(prompt) and f"confirm_{session_token}" in prompt["reply_markup"], True)
+
+        expect("forged_status", post_update(callback_update(4, STRANGER_ID, f"confirm_{session_token}")), 200)
+        forged = wait_for_call("answerCallbackQuery", lambda p: p["callback_query_id"] == "callback-4")
+        expect("forged_answer", forged and forged.get("text"), "❌ Сессия устарела")
+        expect("verify_after_forged",
+               client.post("/api/auth/verify-login", json={"session_token": session_token}).status_code, 403)
+
+        expect("owner_status", post_update(callback_update(5, OWNER_ID, f"confirm_{session_token}")), 200)
+        owner = wait_for_call("answerCallbackQuery", lambda p: p["callback_query_id"] == "callback-5")
+        expect("owner_answer", owner and owner.get("text"), "✅ Вход подтвержден")
+        expect("verify_after_owner",
+               client.post("/api/auth/verify-login", json={"session_token": session_token}).status_code, 200)
+
+    server.shutdown()
+    report["bot_api_calls"] = [method for method, _ in StubBotAPI.calls]
+    print(json.dumps(report, indent=2, ensure_ascii=False))
+    if failures:
+        sys.exit("\n".join(failures))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,74 @@
+"""Concurrent-request latency against a running API instance.
+
+Fires a mix of slow (login) and cheap (status) requests at the same time so
+that event-loop stalls show up as inflated latency on the cheap route. Run it
+once against the old build and once against the new one and compare.
+
+    python benchmarks/concurrent_latency.py --url http://127.0.0.1:8080 \\
+        --email user@example.com --password secret --concurrency 50
+"""
+import argparse
+import asyncio
+import json
+import statistics
+import time
+
+import httpx
+
+from _common import percentile
+
+
+async def timed(client, method, path, **kwargs):
+    started = time.perf_counter()
+    try:
+        await client.request(method, path, **kwargs)
+    except httpx.HTTPError:
+        pass
+    return (time.perf_counter() - started) * 1000
+
+
+async def run(args):
+    async with httpx.AsyncClient(base_url=args.url, timeout=args.timeout) as client:
+        login_latencies = []
+        status_latencies = []
+        started = time.perf_counter()
+
+        for _ in range(args.rounds):
+            tasks = []
+            for _ in range(args.concurrency):
+                tasks.append(timed(client, "POST", "/api/auth/login", json={
+                    "email": args.email,
+                    "password": args.password
+                }))
+                tasks.append(timed(client, "GET", "/"))
+            results = await asyncio.gather(*tasks)
+            login_latencies.extend(results[0::2])
+            status_latencies.extend(results[1::2])
+
+        elapsed = time.perf_counter() - started
+
+    report = {"elapsed_s": round(elapsed, 3)}
+    for name, values in (("login", login_latencies), ("status", status_latencies)):
+        report[name] = {
+            "requests": len(values),
+            "mean_ms": round(statistics.fmean(values), 2),
+            "p50_ms": round(percentile(values, 50), 2),
+            "p95_ms": round(percentile(values, 95), 2),
+            "p99_ms": round(percentile(values, 99), 2)
+        }
+    print(json.dumps(report, indent=2))
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--url", default="http://127.0.0.1:8080")
+    parser.add_argument("--email", required=True)
+    parser.add_argument("--password", required=True)
+    parser.add_argument("--concurrency", type=int, default=50)
+    parser.add_argument("--rounds", type=int, default=10)
+    parser.add_argument("--timeout", type=float, default=30.0)
+    asyncio.run(run(parser.parse_args()))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,116 @@
+"""Parallel signing stress check for app.documents.sign_document.
+
+Creates one document with N signers, then has every signer sign it from a
+thread pool, each of them twice, at the same time. Afterwards exactly N
+signs must have succeeded, the pending counter must be zero and the
+document must be SIGNED. Exits non-zero otherwise.
+
+    BENCH_DATABASE_URL=postgresql+psycopg2://... python benchmarks/concurrent_signing.py --signers 500
+"""
+import argparse
+import json
+import sys
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from _common import bench_database_url
+
+BENCH_DATABASE_URL = bench_database_url("concurrent_signing")
+
+from sqlalchemy import create_engine, insert, select, func
+from sqlalchemy.exc import OperationalError
+from sqlalchemy.orm import sessionmaker
+
+from app.database import Base
+from app.documents import create_documents, sign_document
+from app.enums import DocumentStatus, SignatureStatus
+from app.models import Document, Signature, User
+
+
+class Draft:
+    title = "Concurrent signing"
+    file_url = "https://example.com/document.pdf"
+
+    def __init__(self, recipients):
+        self.recipients = recipients
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--signers", type=int, default=200)
+    parser.add_argument("--threads", type=int, default=32)
+    args = parser.parse_args()
+
+    connect_args = {"timeout": 60} if BENCH_DATABASE_URL.startswith("sqlite") else {}
+    engine = create_engine(
+        BENCH_DATABASE_URL,
+        pool_size=args.threads,
+        connect_args=connect_args
+    )
+    Base.metadata.drop_all(engine)
+    Base.metadata.create_all(engine)
+    SessionLocal = sessionmaker(bind=engine, autoflush=False)
+
+    signers = list(range(2, args.signers + 2))
+    with engine.begin() as conn:
+        conn.execute(insert(User), [{
+            "id": i,
+            "email": f"user{i}@example.com",
+            "phone": f"+7{i:010d}",
+            "name": f"User {i}",
+            "password_hash": "x"
+        } for i in [1] + signers])
+
+    with SessionLocal() as db:
+        document_id = create_documents(db, 1, [Draft(signers)])[0]
+        db.commit()
+
+    def sign(signer_id):
+        while True:
+            with SessionLocal() as db:
+                try:
+                    remaining = sign_document(db, document_id, signer_id)
+                    db.commit()
+                    return remaining
+                except OperationalError:
+                    # SQLite only: "database is locked" under write contention
+                    db.rollback()
+                    time.sleep(0.01)
+
+    started = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=args.threads) as pool:
+        results = list(pool.map(sign, signers * 2))
+    elapsed = time.perf_counter() - started
+
+    with SessionLocal() as db:
+        document = db.get(Document, document_id)
+        still_pending = db.scalar(select(func.count()).select_from(Signature).where(
+            Signature.document_id == document_id,
+            Signature.status == SignatureStatus.PENDING
+        ))
+
+    succeeded = [r for r in results if r is not None]
+    report = {
+        "database": engine.dialect.name,
+        "signers": args.signers,
+        "attempts": len(results),
+        "succeeded": len(succeeded),
+        "pending_counter": document.pending_signatures,
+        "pending_rows": still_pending,
+        "document_status": document.status.value,
+        "elapsed_s": round(elapsed, 3)
+    }
+    print(json.dumps(report, indent=2))
+
+    ok = (
+        len(succeeded) == args.signers
+        and sorted(succeeded) == list(range(args.signers))
+        and document.pending_signatures == 0
+        and still_pending == 0
+        and document.status == DocumentStatus.SIGNED
+    )
+    sys.exit(0 if ok else 1)
+
+
+if __name__ == "__main__":
+    main()
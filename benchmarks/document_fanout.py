@@ -0,0 +1,114 @@
+"""Document creation cost as the recipient count grows.
+
+Compares the old per-row path (commit the document, then one ORM add per
+signature and a second commit) with app.documents.create_documents, at
+10/1k/10k recipients by default. Uses BENCH_DATABASE_URL, or a throwaway
+SQLite file when it is not set; point it at a scratch Postgres for numbers
+that matter.
+
+    BENCH_DATABASE_URL=postgresql+psycopg2://... python benchmarks/document_fanout.py
+"""
+import argparse
+import json
+import time
+
+from _common import bench_database_url
+
+BENCH_DATABASE_URL = bench_database_url("document_fanout")
+
+from sqlalchemy import create_engine, event, insert
+from sqlalchemy.orm import sessionmaker
+
+from app.database import Base
+from app.documents import create_documents
+from app.enums import DocumentStatus, SignatureStatus
+from app.models import Document, Signature, User
+
+
+class Draft:
+    def __init__(self, recipients):
+        self.title = "Benchmark document"
+        self.file_url = "https://example.com/document.pdf"
+        self.recipients = recipients
+
+
+def legacy_create(db, sender_id, recipients):
+    document = Document(
+        title="Benchmark document",
+        content="https://example.com/document.pdf",
+        sender_id=sender_id,
+        status=DocumentStatus.DRAFT
+    )
+    db.add(document)
+    db.commit()
+    db.refresh(document)
+    for recipient in recipients:
+        db.add(Signature(
+            document_id=document.id,
+            signer_id=recipient,
+            status=SignatureStatus.PENDING
+        ))
+    db.commit()
+
+
+def bulk_create(db, sender_id, recipients):
+    create_documents(db, sender_id, [Draft(recipients)])
+    db.commit()
+
+
+def measure(SessionLocal, statements, fn, sender_id, recipients, repeat):
+    timings = []
+    for _ in range(repeat):
+        db = SessionLocal()
+        statements[0] = 0
+        started = time.perf_counter()
+        fn(db, sender_id, recipients)
+        timings.append(time.perf_counter() - started)
+        db.close()
+    return {
+        "best_ms": round(min(timings) * 1000, 2),
+        "statements": statements[0]
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--sizes", type=int, nargs="+", default=[10, 1000, 10000])
+    parser.add_argument("--repeat", type=int, default=3)
+    args = parser.parse_args()
+
+    engine = create_engine(BENCH_DATABASE_URL)
+    Base.metadata.drop_all(engine)
+    Base.metadata.create_all(engine)
+    SessionLocal = sessionmaker(bind=engine, autoflush=False)
+
+    statements = [0]
+
+    @event.listens_for(engine, "before_cursor_execute")
+    def count_statement(*_):
+        statements[0] += 1
+
+    largest = max(args.sizes)
+    with engine.begin() as conn:
+        conn.execute(insert(User), [{
+            "id": i,
+            "email": f"user{i}@example.com",
+            "phone": f"+7{i:010d}",
+            "name": f"User {i}",
+            "password_hash": "x"
+        } for i in range(1, largest + 2)])
+
+    results = []
+    for size in args.sizes:
+        recipients = list(range(2, size + 2))
+        results.append({
+            "recipients": size,
+            "legacy": measure(SessionLocal, statements, legacy_create, 1, recipients, args.repeat),
+            "bulk": measure(SessionLocal, statements, bulk_create, 1, recipients, args.repeat)
+        })
+
+    print(json.dumps({"database": engine.dialect.name, "results": results}, indent=2))
+
+
+if __name__ == "__main__":
+    main()
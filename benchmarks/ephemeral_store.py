@@ -0,0 +1,81 @@
+"""Per-operation latency of the ephemeral store backends.
+
+Runs the login flow (create, confirm, get, pop) and the registration code
+flow (put, get, delete) against each backend and reports mean microseconds
+per flow. Redis runs on fakeredis unless BENCH_REDIS_URL points at a real
+server.
+
+    python benchmarks/ephemeral_store.py --rounds 2000
+"""
+import argparse
+import json
+import os
+import time
+from uuid import uuid4
+
+from _common import bench_database_url
+
+BENCH_DATABASE_URL = bench_database_url("ephemeral_store")
+
+from sqlalchemy import create_engine
+from sqlalchemy.orm import sessionmaker
+
+from app.database import Base
+from app.ephemeral import (DatabaseEphemeralStore, MemoryEphemeralStore,
+    RedisEphemeralStore)
+
+
+def redis_client():
+    if os.getenv("BENCH_REDIS_URL"):
+        import redis
+        return redis.Redis.from_url(os.getenv("BENCH_REDIS_URL"))
+    import fakeredis
+    return fakeredis.FakeRedis()
+
+
+def login_flow(store, user_id):
+    token = str(uuid4())
+    store.create_login_session(token, user_id)
+    store.confirm_login_session(token)
+    assert store.get_login_session(token).is_confirmed
+    assert store.pop_login_session(token)
+
+
+def code_flow(store, user_id):
+    code = uuid4().hex
+    email = f"user{user_id}@example.com"
+    assert store.put_confirmation_code(email, code)
+    assert store.pop_confirmation_email(code) == email
+
+
+def measure(store, flow, rounds):
+    started = time.perf_counter()
+    for i in range(rounds):
+        flow(store, i)
+    return round((time.perf_counter() - started) / rounds * 1e6, 1)
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--rounds", type=int, default=1000)
+    args = parser.parse_args()
+
+    engine = create_engine(BENCH_DATABASE_URL)
+    Base.metadata.create_all(engine)
+
+    stores = {
+        "database": DatabaseEphemeralStore(sessionmaker(bind=engine)),
+        "memory": MemoryEphemeralStore(),
+        "redis": RedisEphemeralStore(redis_client()),
+    }
+    print(json.dumps({
+        name: {
+            "login_flow_us": measure(store, login_flow, args.rounds),
+            "code_flow_us": measure(store, code_flow, args.rounds),
+        }
+        for name, store in stores.items()
+    }, indent=2))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,103 @@
+"""Throughput of the bulk membership import against one-by-one adds.
+
+Seeds N users and a department, then onboards them twice into fresh
+organizations: once the way add_user_to_department works (existence
+query, insert and commit per user) and once through import_memberships.
+A third run repeats the import to measure the all-conflicts path.
+
+    BENCH_DATABASE_URL=postgresql+psycopg2://... python benchmarks/membership_import.py --users 5000
+"""
+import argparse
+import json
+import time
+
+from _common import bench_database_url
+
+BENCH_DATABASE_URL = bench_database_url("membership_import")
+
+from sqlalchemy import create_engine, insert, select
+from sqlalchemy.orm import sessionmaker
+
+from app.database import Base
+from app.enums import UserRole
+from app.memberships import import_memberships
+from app.models import User, Organization, Department, UserOrganization, UserDepartmentRole
+from app.schemas import MembershipImportRow
+
+
+def seed(db, users):
+    first = db.scalar(select(User.id).order_by(User.id.desc()).limit(1)) or 0
+    db.execute(insert(User), [
+        {"email": f"import{first + i}@example.com", "phone": f"+7{first + i:010d}",
+         "name": f"Import {first + i}", "password_hash": "x"}
+        for i in range(1, users + 1)
+    ])
+    user_ids = list(db.scalars(select(User.id).where(User.id > first).order_by(User.id)))
+    db.commit()
+    return user_ids
+
+
+def new_department(db):
+    org = Organization(name="Import benchmark")
+    db.add(org)
+    db.flush()
+    department = Department(name="Everyone", organization_id=org.id)
+    db.add(department)
+    db.commit()
+    return org.id, department.id
+
+
+def one_by_one(db, org_id, dep_id, user_ids):
+    for user_id in user_ids:
+        existing = db.query(UserDepartmentRole).filter(
+            UserDepartmentRole.user_id == user_id,
+            UserDepartmentRole.department_id == dep_id
+        ).first()
+        if existing:
+            continue
+        db.add(UserOrganization(user_id=user_id, organization_id=org_id))
+        db.add(UserDepartmentRole(user_id=user_id, department_id=dep_id, role=UserRole.VIEWER))
+        db.commit()
+
+
+def timed(fn, *args):
+    started = time.perf_counter()
+    result = fn(*args)
+    return time.perf_counter() - started, result
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--users", type=int, default=5000)
+    args = parser.parse_args()
+
+    engine = create_engine(BENCH_DATABASE_URL)
+    Base.metadata.create_all(engine)
+    db = sessionmaker(bind=engine)()
+    user_ids = seed(db, args.users)
+
+    org_id, dep_id = new_department(db)
+    single_seconds, _ = timed(one_by_one, db, org_id, dep_id, user_ids)
+
+    org_id, dep_id = new_department(db)
+    rows = [
+        (number, MembershipImportRow(user_id=user_id, department_id=dep_id))
+        for number, user_id in enumerate(user_ids, start=1)
+    ]
+    bulk_seconds, results = timed(import_memberships, db, org_id, rows)
+    assert all(result["status"] == "added" for result in results)
+    rerun_seconds, results = timed(import_memberships, db, org_id, rows)
+    assert all(result["status"] == "exists" for result in results)
+
+    print(json.dumps({
+        "database": engine.dialect.name,
+        "users": args.users,
+        "one_by_one_rows_per_sec": round(args.users / single_seconds),
+        "bulk_rows_per_sec": round(args.users / bulk_seconds),
+        "bulk_rerun_rows_per_sec": round(args.users / rerun_seconds),
+        "speedup": round(single_seconds / bulk_seconds, 1),
+    }, indent=2))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,55 @@
+"""Password verification throughput at the configured argon2 cost.
+
+Reports single-hash latency and logins/sec, total and per core, when
+verifications run on the same thread pool the API uses. Tune with the
+PASSWORD_ARGON2_* and PASSWORD_HASH_WORKERS env vars.
+
+    python benchmarks/password_hashing.py --logins 200
+"""
+import argparse
+import asyncio
+import json
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from app.passwords import (pwd_context, hash_password, verify_password_async,
+    PASSWORD_HASH_WORKERS)
+
+
+async def run(args):
+    stored = hash_password("benchmark-password")
+
+    started = time.perf_counter()
+    pwd_context.verify("benchmark-password", stored)
+    single_ms = (time.perf_counter() - started) * 1000
+
+    started = time.perf_counter()
+    await asyncio.gather(*(
+        verify_password_async("benchmark-password", stored)
+        for _ in range(args.logins)
+    ))
+    elapsed = time.perf_counter() - started
+
+    workers = min(PASSWORD_HASH_WORKERS, os.cpu_count() or 1)
+    print(json.dumps({
+        "scheme": stored.split("$")[1],
+        "params": stored.split("$")[3],
+        "workers": PASSWORD_HASH_WORKERS,
+        "single_verify_ms": round(single_ms, 2),
+        "logins": args.logins,
+        "logins_per_sec": round(args.logins / elapsed, 1),
+        "logins_per_sec_per_core": round(args.logins / elapsed / workers, 1)
+    }, indent=2))
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--logins", type=int, default=200)
+    asyncio.run(run(parser.parse_args()))
+
+
+if __name__ == "__main__":
+    main()
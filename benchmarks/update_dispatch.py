@@ -0,0 +1,94 @@
+"""Throughput of the bot's update dispatcher at a login peak.
+
+Feeds synthetic callback-query updates from many chats through
+TelegramUpdateDispatcher with a handler that sleeps for the time a login
+confirmation spends on the database and the Telegram API. Runs once with
+a single worker (the old one-at-a-time behaviour) and once per --workers
+value, and checks that every chat's updates were handled in order.
+
+    python benchmarks/update_dispatch.py --updates 2000 --chats 500 --handler-ms 40
+"""
+import argparse
+import json
+import sys
+import threading
+import time
+
+from _common import percentile
+
+from telebot.types import Update
+
+from app.dispatcher import TelegramUpdateDispatcher
+
+
+def make_updates(count, chats):
+    return [
+        Update.de_json({
+            "update_id": i,
+            "callback_query": {
+                "id": str(i),
+                "from": {"id": 1000 + i % chats, "is_bot": False, "first_name": "U"},
+                "chat_instance": "bench",
+                "data": f"confirm_{i}",
+            },
+        })
+        for i in range(1, count + 1)
+    ]
+
+
+def run(updates, workers, handler_seconds, max_queue):
+    handled = []
+    lock = threading.Lock()
+    submitted = {}
+
+    def handle(update):
+        time.sleep(handler_seconds)
+        with lock:
+            handled.append((update.callback_query.from_user.id, update.update_id,
+                            time.perf_counter() - submitted[update.update_id]))
+
+    dispatcher = TelegramUpdateDispatcher(handle, workers=workers, max_queue=max_queue)
+    started = time.perf_counter()
+    for update in updates:
+        submitted[update.update_id] = time.perf_counter()
+        dispatcher.submit(update)
+    dispatcher.stop()
+    elapsed = time.perf_counter() - started
+
+    by_chat = {}
+    for chat, update_id, _ in handled:
+        by_chat.setdefault(chat, []).append(update_id)
+    latencies = [latency for _, _, latency in handled]
+    return {
+        "workers": workers,
+        "updates_per_sec": round(len(handled) / elapsed),
+        "p50_ms": round(percentile(latencies, 50) * 1000, 1),
+        "p95_ms": round(percentile(latencies, 95) * 1000, 1),
+        "per_chat_order_kept": all(ids == sorted(ids) for ids in by_chat.values()),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--updates", type=int, default=2000)
+    parser.add_argument("--chats", type=int, default=500)
+    parser.add_argument("--handler-ms", type=float, default=40)
+    parser.add_argument("--workers", type=int, nargs="*", default=[8, 32])
+    parser.add_argument("--max-queue", type=int, default=100)
+    args = parser.parse_args()
+
+    updates = make_updates(args.updates, args.chats)
+    runs = [run(updates, workers, args.handler_ms / 1000, args.max_queue)
+            for workers in [1] + args.workers]
+    print(json.dumps({
+        "updates": args.updates,
+        "chats": args.chats,
+        "handler_ms": args.handler_ms,
+        "runs": runs,
+    }, indent=2))
+    if not all(result["per_chat_order_kept"] for result in runs):
+        sys.exit("per-chat order violated")
+
+
+if __name__ == "__main__":
+    main()
@@ -1,25 +1,48 @@
 import telebot
 from telebot.types import InlineKeyboardMarkup, InlineKeyboardButton, CallbackQuery
 import os
-from dotenv import load_dotenv
-from sqlalchemy import create_engine
-from sqlalchemy.orm import sessionmaker
-from app.models import User, ConfirmationCode, LoginSession
-from app.database import Base
+from app.models import User
+from app.database import SessionLocal
+from app.notifications import login_notifier
+from app.ephemeral import ephemeral_store
+from app.outbox import outbox
+from app.dispatcher import TelegramUpdateDispatcher
+from app.telegram import BOT_WEBHOOK_URL, BOT_WEBHOOK_SECRET, require_webhook_secret
 import logging
-from datetime import datetime
 
 # Настройка логирования
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
-load_dotenv()
+# Lets a local fake Telegram server stand in for api.telegram.org
+if os.getenv("TELEGRAM_API_URL"):
+    telebot.apihelper.API_URL = os.getenv("TELEGRAM_API_URL").rstrip("/") + "/bot{0}/{1}"
 
-bot = telebot.TeleBot(token=os.getenv("BOT_TOKEN"))
+class DispatchingTeleBot(telebot.TeleBot):
+    """Hands updates to update_dispatcher instead of running the handlers
+    on the polling thread. Built with threaded=False so that each handler
+    runs inline on the dispatcher worker that owns its chat."""
 
-DB_URL = f"postgresql://{os.getenv('DB_USER')}:{os.getenv('DB_PASS')}@{os.getenv('DB_HOST')}:{os.getenv('DB_PORT')}/{os.getenv('DB_NAME')}"
-engine = create_engine(DB_URL)
-SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
+    def process_new_updates(self, updates):
+        # Advance the getUpdates offset here, on the polling thread. Workers
+        # then always see update_id <= last_update_id and never move it back.
+        for update in updates:
+            self.last_update_id = max(self.last_update_id, update.update_id)
+        for update in updates:
+            update_dispatcher.submit(update)
+
+    def handle_update(self, update):
+        super().process_new_updates([update])
+
+bot = DispatchingTeleBot(token=os.getenv("BOT_TOKEN"), threaded=False)
+
+# Handlers block on the database and the Telegram API, so there can be more
+# workers than cores. Polling waits while a chat's worker queue is full.
+update_dispatcher = TelegramUpdateDispatcher(
+    bot.handle_update,
+    workers=int(os.getenv("TELEGRAM_UPDATE_WORKERS", "8")),
+    max_queue=int(os.getenv("TELEGRAM_UPDATE_MAX_QUEUE", "100"))
+)
 
 def create_login_confirmation_keyboard(session_token: str):
     keyboard = InlineKeyboardMarkup(row_width=2)
@@ -35,6 +58,19 @@ def create_login_confirmation_keyboard(session_token: str):
     )
     return keyboard
 
+def session_owned_by(session_token: str, telegram_id) -> bool:
+    """Whether the login session belongs to the user linked to this
+    Telegram account. Only that account may confirm or reject it."""
+    state = ephemeral_store.get_login_session(session_token)
+    if state is None:
+        return False
+    db = SessionLocal()
+    try:
+        owner = db.query(User.telegram_id).filter(User.id == state.user_id).scalar()
+    finally:
+        db.close()
+    return owner is not None and owner == str(telegram_id)
+
 def setup_handlers():
     @bot.message_handler(commands=['start'])
     def start(message):
@@ -42,20 +78,16 @@ def setup_handlers():
             logger.info(f"Received start command: {message.text}")
             parts = message.text.split()
             if len(parts) > 1:
-                type_parts = parts[1].split("_")
+                # Tokens are hex, but never let the payload split further
+                type_parts = parts[1].split("_", 1)
 
-                if type_parts[0] == "reg":
+                if type_parts[0] == "reg" and len(type_parts) == 2:
                     code = type_parts[1]
                     db = SessionLocal()
+                    email = None
+                    linked = False
 
                     try:
-                        confirmation = db.query(ConfirmationCode).filter(
-                            ConfirmationCode.code == code
-                        ).first()
-
-                        if not confirmation:
-                            bot.reply_to(message, "❌ Неверный код подтверждения")
-                            return
                         existing_user = db.query(User).filter(
                             User.telegram_id == str(message.from_user.id)
                         ).first()
@@ -64,8 +96,16 @@ def setup_handlers():
                             bot.reply_to(message, "⚠️ Этот Telegram аккаунт уже привязан к другой учетной записи.")
                             return
 
+                        # Consumed up front: of two concurrent /start messages
+                        # with the same code only one gets the email
+                        email = ephemeral_store.pop_confirmation_email(code)
+
+                        if not email:
+                            bot.reply_to(message, "❌ Неверный код подтверждения")
+                            return
+
                         user = db.query(User).filter(
-                            User.email == confirmation.email
+                            User.email == email
                         ).first()
 
                         if not user:
@@ -73,13 +113,16 @@ def setup_handlers():
                             return
 
                         user.telegram_id = str(message.from_user.id)
-                        confirmation.code = None
                         db.commit()
+                        linked = True
 
                         bot.reply_to(message, f"✅ Ваш Telegram успешно привязан к аккаунту {user.email}!")
 
                     except Exception as e:
                         db.rollback()
+                        if email and not linked:
+                            # Give the code back so the user can retry the link
+                            ephemeral_store.put_confirmation_code(email, code)
                         logger.error(f"Database error: {e}")
                         bot.reply_to(message, "❌ Произошла ошибка при обработке запроса")
                     finally:
@@ -91,32 +134,36 @@ def setup_handlers():
 
     @bot.callback_query_handler(func=lambda call: call.data.startswith(('confirm_', 'reject_')))
     def handle_login_confirmation(call: CallbackQuery):
-        db = None
         try:
             action, session_token = call.data.split('_', 1)
-            db = SessionLocal()
 
-            login_session = db.query(LoginSession).filter(
-                LoginSession.session_token == session_token,
-                LoginSession.expires_at > datetime.now()
-            ).first()
-
-            if not login_session:
+            if not session_owned_by(session_token, call.from_user.id):
                 bot.answer_callback_query(call.id, "❌ Сессия устарела")
                 return
+
             if action == "confirm":
-                login_session.is_confirmed = True
-                db.commit()
+                if not ephemeral_store.confirm_login_session(session_token):
+                    bot.answer_callback_query(call.id, "❌ Сессия устарела")
+                    return
+                login_notifier.publish(session_token, True)
                 bot.answer_callback_query(call.id, "✅ Вход подтвержден")
-                bot.send_message(
+                # The follow-up message is not urgent; the outbox sends it
+                # so this worker can move on to the chat's next update
+                outbox.enqueue(
+                    call.from_user.id,
+                    bot.send_message,
                     call.from_user.id,
                     "Вы успешно подтвердили вход в аккаунт."
                 )
             else:
-                db.delete(login_session)
-                db.commit()
+                if not ephemeral_store.pop_login_session(session_token):
+                    bot.answer_callback_query(call.id, "❌ Сессия устарела")
+                    return
+                login_notifier.publish(session_token, False)
                 bot.answer_callback_query(call.id, "❌ Вход отклонен")
-                bot.send_message(
+                outbox.enqueue(
+                    call.from_user.id,
+                    bot.send_message,
                     call.from_user.id,
                     "Вы отклонили попытку входа в аккаунт."
                 )
@@ -124,29 +171,39 @@ def setup_handlers():
         except Exception as e:
             logger.error(f"Error handling login confirmation: {e}")
             bot.answer_callback_query(call.id, "⚠️ Ошибка обработки запроса")
-        finally:
-            if db:
-                db.close()
 
 def send_login_2fa_buttons(telegram_id: str, session_token: str):
-    try:
-        bot.send_message(
-            telegram_id,
-            "🔐 Попытка входа в аккаунт\n\n"
-            "Подтвердите вход:",
-            reply_markup=create_login_confirmation_keyboard(session_token)
-        )
-    except Exception as e:
-        logger.error(f"Error sending login confirmation: {e}")
+    # Only enqueues: delivery, retries and rate limiting happen on the
+    # outbox workers. Raises OutboxFull when the queue is saturated.
+    outbox.enqueue(
+        telegram_id,
+        bot.send_message,
+        telegram_id,
+        "🔐 Попытка входа в аккаунт\n\n"
+        "Подтвердите вход:",
+        reply_markup=create_login_confirmation_keyboard(session_token)
+    )
 
-def run_bot():
-    try:
-        logger.info("Starting bot...")
-        setup_handlers()
-        bot.infinity_polling()
-    except Exception as e:
-        logger.error(f"Bot crashed: {e}")
+def configure_webhook():
+    """Point Telegram at the API's webhook route. Run once per deployment,
+    not per worker."""
+    require_webhook_secret()
+    bot.remove_webhook()
+    bot.set_webhook(url=BOT_WEBHOOK_URL, secret_token=BOT_WEBHOOK_SECRET)
+    logger.info(f"Webhook set to {BOT_WEBHOOK_URL}")
 
 def run_bot():
+    logger.info("Starting bot...")
     setup_handlers()
-    bot.infinity_polling()
+    try:
+        bot.infinity_polling()
+    finally:
+        # Finish the updates already received, then let the replies they
+        # queued go out before the process exits
+        timeout = float(os.getenv("OUTBOX_SHUTDOWN_TIMEOUT_SECONDS", "10"))
+        update_dispatcher.stop(timeout=timeout)
+        outbox.stop(timeout=timeout)
+
+def stop_bot():
+    """Ask infinity_polling to return after the current long poll."""
+    bot.stop_polling()
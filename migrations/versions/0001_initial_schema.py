@@ -0,0 +1,126 @@
+"""Initial schema, as previously created by Base.metadata.create_all
+
+Databases that were bootstrapped by create_all should be marked with
+`alembic stamp 0001` instead of running this revision.
+
+Revision ID: 0001
+Revises:
+Create Date: 2026-10-17
+"""
+from alembic import op
+import sqlalchemy as sa
+
+revision = "0001"
+down_revision = None
+branch_labels = None
+depends_on = None
+
+user_role = sa.Enum("VIEWER", "EDITOR", "MANAGER", "ADMIN", name="userrole")
+document_status = sa.Enum("DRAFT", "SENT", "SIGNED", "DECLINED", name="documentstatus")
+invite_status = sa.Enum("PENDING", "ACCEPTED", "DECLINED", name="invitestatus")
+
+
+def upgrade():
+    op.create_table(
+        "users",
+        sa.Column("id", sa.Integer(), primary_key=True),
+        sa.Column("email", sa.String(255), nullable=False, unique=True),
+        sa.Column("phone", sa.String(20), nullable=False, unique=True),
+        sa.Column("name", sa.String(255), nullable=False),
+        sa.Column("password_hash", sa.Text(), nullable=False),
+        sa.Column("telegram_id", sa.String(30)),
+    )
+    op.create_index("ix_users_id", "users", ["id"])
+
+    op.create_table(
+        "organizations",
+        sa.Column("id", sa.Integer(), primary_key=True),
+        sa.Column("name", sa.String(255), nullable=False),
+        sa.Column("owner_id", sa.Integer(), sa.ForeignKey("users.id", ondelete="SET NULL")),
+    )
+    op.create_index("ix_organizations_id", "organizations", ["id"])
+
+    op.create_table(
+        "departments",
+        sa.Column("id", sa.Integer(), primary_key=True),
+        sa.Column("name", sa.String(255), nullable=False),
+        sa.Column("organization_id", sa.Integer(), sa.ForeignKey("organizations.id", ondelete="CASCADE")),
+    )
+    op.create_index("ix_departments_id", "departments", ["id"])
+
+    op.create_table(
+        "user_organizations",
+        sa.Column("user_id", sa.Integer(), sa.ForeignKey("users.id", ondelete="CASCADE"), primary_key=True),
+        sa.Column("organization_id", sa.Integer(), sa.ForeignKey("organizations.id", ondelete="CASCADE"), primary_key=True),
+    )
+
+    op.create_table(
+        "user_department_roles",
+        sa.Column("user_id", sa.Integer(), sa.ForeignKey("users.id", ondelete="CASCADE"), primary_key=True),
+        sa.Column("department_id", sa.Integer(), sa.ForeignKey("departments.id", ondelete="CASCADE"), primary_key=True),
+        sa.Column("role", user_role, nullable=False),
+    )
+
+    op.create_table(
+        "documents",
+        sa.Column("id", sa.Integer(), primary_key=True),
+        sa.Column("title", sa.String(255), nullable=False),
+        sa.Column("content", sa.Text(), nullable=False),
+        sa.Column("sender_id", sa.Integer(), sa.ForeignKey("users.id", ondelete="SET NULL")),
+        sa.Column("organization_id", sa.Integer(), sa.ForeignKey("organizations.id", ondelete="CASCADE")),
+        sa.Column("status", document_status),
+        sa.Column("created_at", sa.TIMESTAMP(), server_default=sa.func.now()),
+    )
+    op.create_index("ix_documents_id", "documents", ["id"])
+
+    op.create_table(
+        "signatures",
+        sa.Column("id", sa.Integer(), primary_key=True),
+        sa.Column("document_id", sa.Integer(), sa.ForeignKey("documents.id", ondelete="CASCADE")),
+        sa.Column("signer_id", sa.Integer(), sa.ForeignKey("users.id", ondelete="CASCADE")),
+        sa.Column("signature_hash", sa.Text(), nullable=False),
+        sa.Column("signed_at", sa.TIMESTAMP()),
+        sa.Column("confirmed_via", sa.String(20)),
+        sqlite_autoincrement=True,
+    )
+    op.create_index("ix_signatures_id", "signatures", ["id"])
+
+    op.create_table(
+        "login_sessions",
+        sa.Column("id", sa.Integer(), primary_key=True),
+        sa.Column("user_id", sa.Integer(), sa.ForeignKey("users.id")),
+        sa.Column("session_token", sa.String(64), unique=True),
+        sa.Column("is_confirmed", sa.Boolean()),
+        sa.Column("created_at", sa.DateTime()),
+        sa.Column("expires_at", sa.DateTime()),
+    )
+
+    op.create_table(
+        "invites",
+        sa.Column("id", sa.Integer(), primary_key=True),
+        sa.Column("organization_id", sa.Integer(), sa.ForeignKey("organizations.id", ondelete="CASCADE")),
+        sa.Column("email_or_phone", sa.String(255), nullable=False),
+        sa.Column("token", sa.String(64), nullable=False, unique=True),
+        sa.Column("status", invite_status),
+    )
+    op.create_index("ix_invites_id", "invites", ["id"])
+
+    op.create_table(
+        "confirmation_codes",
+        sa.Column("id", sa.Integer(), primary_key=True),
+        sa.Column("email", sa.String(255), nullable=False),
+        sa.Column("code", sa.String(6)),
+        sa.Column("expires_at", sa.TIMESTAMP()),
+        sa.Column("is_used", sa.Boolean()),
+        sa.Column("telegram_verified", sa.Boolean()),
+    )
+
+
+def downgrade():
+    for table in ("confirmation_codes", "invites", "login_sessions", "signatures",
+                  "documents", "user_department_roles", "user_organizations",
+                  "departments", "organizations", "users"):
+        op.drop_table(table)
+    bind = op.get_bind()
+    for enum in (invite_status, document_status, user_role):
+        enum.drop(bind, checkfirst=True)
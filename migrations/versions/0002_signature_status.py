@@ -0,0 +1,50 @@
+"""Signature status column; signature_hash is only known once signed
+
+Revision ID: 0002
+Revises: 0001
+Create Date: 2026-10-17
+"""
+from alembic import op
+import sqlalchemy as sa
+
+revision = "0002"
+down_revision = "0001"
+branch_labels = None
+depends_on = None
+
+signature_status = sa.Enum("PENDING", "SIGNED", name="signaturestatus")
+
+BATCH_SIZE = 10000
+
+
+def update_in_batches(statement: str):
+    """Run `statement` over signatures in id ranges, each in its own
+    transaction, so a large table is never locked as a whole."""
+    bind = op.get_bind()
+    max_id = bind.execute(sa.text("SELECT max(id) FROM signatures")).scalar() or 0
+
+    with op.get_context().autocommit_block():
+        for start in range(0, max_id + 1, BATCH_SIZE):
+            bind.execute(
+                sa.text(f"{statement} AND signatures.id >= :start AND signatures.id < :stop"),
+                {"start": start, "stop": start + BATCH_SIZE}
+            )
+
+
+def upgrade():
+    signature_status.create(op.get_bind(), checkfirst=True)
+    with op.batch_alter_table("signatures") as batch:
+        batch.add_column(sa.Column(
+            "status", signature_status, nullable=False, server_default="PENDING"
+        ))
+        batch.alter_column("signature_hash", existing_type=sa.Text(), nullable=True)
+    # Rows that already carry a signed_at were signed before the column existed
+    update_in_batches("UPDATE signatures SET status = 'SIGNED' WHERE signed_at IS NOT NULL")
+
+
+def downgrade():
+    update_in_batches("UPDATE signatures SET signature_hash = '' WHERE signature_hash IS NULL")
+    with op.batch_alter_table("signatures") as batch:
+        batch.alter_column("signature_hash", existing_type=sa.Text(), nullable=False)
+        batch.drop_column("status")
+    signature_status.drop(op.get_bind(), checkfirst=True)
@@ -0,0 +1,57 @@
+"""Indexes for the lookup columns on the request hot paths
+
+Built with CREATE INDEX CONCURRENTLY on Postgres so writes to these tables
+are not blocked while the indexes build. That cannot run inside a
+transaction, hence the autocommit block; if a concurrent build fails it
+leaves an INVALID index behind, which must be dropped before retrying.
+
+Revision ID: 0003
+Revises: 0002
+Create Date: 2026-10-17
+"""
+from alembic import op
+import sqlalchemy as sa
+
+revision = "0003"
+down_revision = "0002"
+branch_labels = None
+depends_on = None
+
+INDEXES = [
+    # subscribe_document: the caller's pending signature; inbox EXISTS
+    ("ix_signatures_signer_id_document_id", "signatures", ["signer_id", "document_id"], None),
+    # pending-signature counts per document; signed rows are never scanned
+    ("ix_signatures_document_id_pending", "signatures", ["document_id"],
+     sa.text("status = 'PENDING'")),
+    # inbox "sent" branch, already in keyset order
+    ("ix_documents_sender_id_created_at", "documents", ["sender_id", "created_at", "id"], None),
+    ("ix_documents_organization_id", "documents", ["organization_id"], None),
+    ("ix_departments_organization_id", "departments", ["organization_id"], None),
+    # the primary key leads with user_id, so org-side lookups need their own
+    ("ix_user_organizations_organization_id", "user_organizations", ["organization_id"], None),
+    ("ix_user_department_roles_department_id", "user_department_roles", ["department_id"], None),
+    ("ix_login_sessions_expires_at", "login_sessions", ["expires_at"], None),
+    ("ix_confirmation_codes_email", "confirmation_codes", ["email"], None),
+]
+
+
+def upgrade():
+    with op.get_context().autocommit_block():
+        for name, table, columns, where in INDEXES:
+            op.create_index(
+                name, table, columns,
+                postgresql_concurrently=True,
+                postgresql_where=where,
+                sqlite_where=where,
+                if_not_exists=True,
+            )
+
+
+def downgrade():
+    with op.get_context().autocommit_block():
+        for name, table, _, _ in reversed(INDEXES):
+            op.drop_index(
+                name, table_name=table,
+                postgresql_concurrently=True,
+                if_exists=True,
+            )
@@ -0,0 +1,42 @@
+"""pg_trgm indexes for user search on name, email and phone
+
+On databases other than Postgres the indexes fall back to plain ones, which
+is what the model metadata produces there as well.
+
+Revision ID: 0004
+Revises: 0003
+Create Date: 2026-10-17
+"""
+from alembic import op
+
+revision = "0004"
+down_revision = "0003"
+branch_labels = None
+depends_on = None
+
+COLUMNS = ("name", "email", "phone")
+
+
+def upgrade():
+    if op.get_bind().dialect.name == "postgresql":
+        op.execute("CREATE EXTENSION IF NOT EXISTS pg_trgm")
+
+    with op.get_context().autocommit_block():
+        for column in COLUMNS:
+            op.create_index(
+                f"ix_users_{column}_trgm", "users", [column],
+                postgresql_using="gin",
+                postgresql_ops={column: "gin_trgm_ops"},
+                postgresql_concurrently=True,
+                if_not_exists=True,
+            )
+
+
+def downgrade():
+    with op.get_context().autocommit_block():
+        for column in COLUMNS:
+            op.drop_index(
+                f"ix_users_{column}_trgm", table_name="users",
+                postgresql_concurrently=True,
+                if_exists=True,
+            )
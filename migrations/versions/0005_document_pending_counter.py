@@ -0,0 +1,44 @@
+"""Denormalized pending-signature counter on documents
+
+The column is added with a constant default, which Postgres 11+ applies
+without rewriting the table. The backfill then walks documents in id
+batches, each in its own transaction, so no lock is held for long.
+
+Revision ID: 0005
+Revises: 0004
+Create Date: 2026-10-17
+"""
+from alembic import op
+import sqlalchemy as sa
+
+revision = "0005"
+down_revision = "0004"
+branch_labels = None
+depends_on = None
+
+BATCH_SIZE = 10000
+
+
+def upgrade():
+    op.add_column("documents", sa.Column(
+        "pending_signatures", sa.Integer(), nullable=False, server_default="0"
+    ))
+
+    bind = op.get_bind()
+    max_id = bind.execute(sa.text("SELECT max(id) FROM documents")).scalar() or 0
+
+    with op.get_context().autocommit_block():
+        for start in range(0, max_id + 1, BATCH_SIZE):
+            bind.execute(sa.text("""
+                UPDATE documents SET pending_signatures = (
+                    SELECT count(*) FROM signatures
+                    WHERE signatures.document_id = documents.id
+                      AND signatures.status = 'PENDING'
+                )
+                WHERE documents.id >= :start AND documents.id < :stop
+            """), {"start": start, "stop": start + BATCH_SIZE})
+
+
+def downgrade():
+    with op.batch_alter_table("documents") as batch:
+        batch.drop_column("pending_signatures")
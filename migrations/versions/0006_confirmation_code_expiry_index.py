@@ -0,0 +1,30 @@
+"""Index confirmation_codes.expires_at for the expiry sweeper
+
+Revision ID: 0006
+Revises: 0005
+Create Date: 2026-10-17
+"""
+from alembic import op
+
+revision = "0006"
+down_revision = "0005"
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    with op.get_context().autocommit_block():
+        op.create_index(
+            "ix_confirmation_codes_expires_at", "confirmation_codes", ["expires_at"],
+            postgresql_concurrently=True,
+            if_not_exists=True,
+        )
+
+
+def downgrade():
+    with op.get_context().autocommit_block():
+        op.drop_index(
+            "ix_confirmation_codes_expires_at", table_name="confirmation_codes",
+            postgresql_concurrently=True,
+            if_exists=True,
+        )
@@ -0,0 +1,30 @@
+"""Index signatures.document_id for per-document signature joins
+
+Revision ID: 0007
+Revises: 0006
+Create Date: 2026-10-17
+"""
+from alembic import op
+
+revision = "0007"
+down_revision = "0006"
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    with op.get_context().autocommit_block():
+        op.create_index(
+            "ix_signatures_document_id", "signatures", ["document_id"],
+            postgresql_concurrently=True,
+            if_not_exists=True,
+        )
+
+
+def downgrade():
+    with op.get_context().autocommit_block():
+        op.drop_index(
+            "ix_signatures_document_id", table_name="signatures",
+            postgresql_concurrently=True,
+            if_exists=True,
+        )
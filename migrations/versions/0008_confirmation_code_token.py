@@ -0,0 +1,49 @@
+"""Widen confirmation_codes.code for opaque tokens and make it unique
+
+Revision ID: 0008
+Revises: 0007
+Create Date: 2026-10-17
+"""
+from alembic import op
+import sqlalchemy as sa
+
+revision = "0008"
+down_revision = "0007"
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    # varchar(6) -> varchar(64) only changes the catalog on Postgres; batch
+    # mode lets the same migration rebuild the table on SQLite
+    with op.batch_alter_table("confirmation_codes") as batch:
+        batch.alter_column(
+            "code", type_=sa.String(64), existing_type=sa.String(6), existing_nullable=True
+        )
+    # Six-digit codes could collide; keep the newest holder of each
+    op.execute(
+        "DELETE FROM confirmation_codes WHERE code IS NOT NULL AND id NOT IN ("
+        "SELECT max(id) FROM confirmation_codes WHERE code IS NOT NULL GROUP BY code)"
+    )
+    with op.get_context().autocommit_block():
+        op.create_index(
+            "ix_confirmation_codes_code", "confirmation_codes", ["code"],
+            unique=True,
+            postgresql_concurrently=True,
+            if_not_exists=True,
+        )
+
+
+def downgrade():
+    with op.get_context().autocommit_block():
+        op.drop_index(
+            "ix_confirmation_codes_code", table_name="confirmation_codes",
+            postgresql_concurrently=True,
+            if_exists=True,
+        )
+    # Pending tokens do not fit the old column; they expire within minutes
+    op.execute("DELETE FROM confirmation_codes WHERE length(code) > 6")
+    with op.batch_alter_table("confirmation_codes") as batch:
+        batch.alter_column(
+            "code", type_=sa.String(6), existing_type=sa.String(64), existing_nullable=True
+        )
@@ -1,9 +1,164 @@
-import threading
-from app.main import app, run_fastapi
-from bot import run_bot
+"""Process launcher.
+
+    python run.py api --workers 4   # API only: N uvicorn worker processes
+    python run.py bot               # Telegram polling, or webhook registration
+    python run.py all --workers 4   # both, supervised (default)
+
+Roles scale independently: run one bot process per deployment and as many
+API workers as there are cores. SIGTERM/SIGINT shut every role down
+gracefully; uvicorn drains in-flight requests and the bot stops polling
+and flushes its outbox.
+"""
+import argparse
+import atexit
+import os
+import shutil
+import signal
+import subprocess
+import sys
+import tempfile
+import time
+
+import uvicorn
+from dotenv import load_dotenv
+
+load_dotenv()
+
+# How long `all` waits for a role to exit after SIGTERM before killing it
+SHUTDOWN_TIMEOUT_SECONDS = float(os.getenv("SHUTDOWN_TIMEOUT_SECONDS", "30"))
+
+
+def prepare_metrics_dir():
+    """Point prometheus_client at a shared directory so /metrics covers
+    every process. Must run before any child imports the app."""
+    path = os.getenv("PROMETHEUS_MULTIPROC_DIR")
+    if path:
+        # Files left by a previous run would be merged into this one
+        shutil.rmtree(path, ignore_errors=True)
+        os.makedirs(path)
+    else:
+        path = tempfile.mkdtemp(prefix="flagship-metrics-")
+        os.environ["PROMETHEUS_MULTIPROC_DIR"] = path
+        atexit.register(shutil.rmtree, path, True)
+
+
+def bot_in_api():
+    # Imported on use: app.telegram loads the metrics, which must come
+    # after prepare_metrics_dir
+    from app.telegram import BOT_MODE
+    return BOT_MODE == "webhook"
+
+
+def check_single_process_backend(args):
+    """The memory ephemeral backend lives in one process, so that process
+    must both create login sessions and handle their confirmations."""
+    if os.getenv("EPHEMERAL_BACKEND", "database") != "memory" or os.getenv("RUN_ROLE_CHILD"):
+        return
+    if not bot_in_api() or args.workers > 1:
+        sys.exit("EPHEMERAL_BACKEND=memory needs BOT_MODE=webhook and a single "
+                 "API worker; use the database or redis backend")
+
+
+def share_outbox_rate(args):
+    """Split TELEGRAM_OUTBOX_GLOBAL_RATE between the processes that send:
+    every API worker, plus the bot role when it polls. Standalone roles
+    assume the other one runs with the same API_WORKERS and BOT_MODE."""
+    senders = args.workers + (0 if bot_in_api() else 1)
+    os.environ.setdefault("TELEGRAM_OUTBOX_PROCESSES", str(senders))
+
+
+def run_api(host, port, workers):
+    # Passed by import string so that with several workers only they load
+    # the app, not the supervising process
+    uvicorn.run("app.main:app", host=host, port=port, workers=workers)
+
+
+def run_bot_role():
+    from app.metrics import mark_process_dead
+    from bot import run_bot, stop_bot, configure_webhook
+
+    if bot_in_api():
+        # Updates go to the API workers; this role only registers the hook
+        configure_webhook()
+        return
+
+    signal.signal(signal.SIGTERM, lambda signum, frame: stop_bot())
+    signal.signal(signal.SIGINT, lambda signum, frame: stop_bot())
+    try:
+        run_bot()
+    finally:
+        mark_process_dead(os.getpid())
+
+
+def run_all(args):
+    """Run each role as a child process of this one, via this same script."""
+    api_command = [sys.executable, __file__, "api", "--host", args.host,
+                   "--port", str(args.port), "--workers", str(args.workers)]
+    env = {**os.environ, "RUN_ROLE_CHILD": "1"}
+    roles = {
+        "api": subprocess.Popen(api_command, env=env),
+        "bot": subprocess.Popen([sys.executable, __file__, "bot"], env=env),
+    }
+    stopping = False
+
+    def shutdown(signum=None, frame=None):
+        nonlocal stopping
+        stopping = True
+        for process in roles.values():
+            if process.poll() is None:
+                process.terminate()
+
+    signal.signal(signal.SIGTERM, shutdown)
+    signal.signal(signal.SIGINT, shutdown)
+
+    # Webhook mode's bot role exits once the hook is set; anything else
+    # leaving early takes the whole deployment down with it
+    expected_to_exit = {"bot"} if bot_in_api() else set()
+
+    exit_code = 0
+    while not stopping:
+        for name, process in roles.items():
+            if process.poll() is None or name in expected_to_exit:
+                continue
+            print(f"{name} exited with {process.returncode}, shutting down", file=sys.stderr)
+            exit_code = process.returncode or 1
+            shutdown()
+            break
+        else:
+            time.sleep(1)
+
+    for process in roles.values():
+        try:
+            process.wait(SHUTDOWN_TIMEOUT_SECONDS)
+        except subprocess.TimeoutExpired:
+            process.kill()
+    return exit_code
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Run the API and/or the Telegram bot")
+    parser.add_argument("role", nargs="?", choices=["api", "bot", "all"],
+                        default=os.getenv("APP_ROLE", "all"))
+    parser.add_argument("--host", default=os.getenv("API_HOST", "0.0.0.0"))
+    parser.add_argument("--port", type=int, default=int(os.getenv("API_PORT", "8080")))
+    parser.add_argument("--workers", type=int, default=int(os.getenv("API_WORKERS", "1")))
+    args = parser.parse_args()
+
+    # Roles launched by `all` inherit the directory their parent prepared
+    if args.role == "all" or (args.role == "api" and args.workers > 1):
+        if not os.getenv("RUN_ROLE_CHILD"):
+            prepare_metrics_dir()
+
+    check_single_process_backend(args)
+    share_outbox_rate(args)
+
+    if args.role == "api":
+        run_api(args.host, args.port, args.workers)
+    elif args.role == "bot":
+        run_bot_role()
+    else:
+        sys.exit(run_all(args))
+
 
 if __name__ == "__main__":
-    fastapi_thread = threading.Thread(target=run_fastapi)
-    fastapi_thread.daemon = True
-    fastapi_thread.start()
-    run_bot()
+    main()